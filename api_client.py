@@ -0,0 +1,242 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import BYTE_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (3.05, 10)
+# endpoints whose payload or server-side work needs a different budget
+ENDPOINT_TIMEOUTS = {
+    "status": (2, 3),
+    "crime_events": (3.05, 60),
+    "predict": (3.05, 30),
+    "reports": (3.05, 30),
+}
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    # raised without contacting the backend while the circuit breaker is open
+    pass
+
+
+def is_backend_failure(error):
+    # connection problems, timeouts and 5xx answers; 4xx means the backend is up
+    response = getattr(error, "response", None)
+    return response is None or response.status_code >= 500
+
+
+class CircuitBreaker:
+    # Opens after failure_threshold consecutive backend failures so further
+    # calls fail at once instead of each waiting for its timeout. After
+    # reset_timeout seconds one trial call is let through (half-open); its
+    # success closes the breaker, its failure opens it again.
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half-open", "open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_started = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_started = None
+            # a trial that never reported back does not keep the breaker half-open forever
+            if self.state == self.HALF_OPEN and (self._trial_started is None or now - self._trial_started >= self.reset_timeout):
+                self._trial_started = now
+                return
+            retry_in = max(self.reset_timeout - (now - self.opened_at), 0)
+        raise CircuitOpenError("The backend is unavailable, retrying in {:.0f}s".format(retry_in))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Backend recovered, closing the circuit breaker")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                logger.warning("Opening the circuit breaker after {} backend failures".format(self.failures))
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self.state != self.CLOSED
+
+
+class ApiClient:
+    # Process-wide client for the crime backend. A single requests.Session keeps
+    # connections alive across reruns and sessions, so repeated calls reuse the
+    # pooled TCP/TLS connections instead of opening new ones.
+
+    def __init__(self, base_url, pool_size=20, retries=3, backoff_factor=0.3, timeouts=None, default_timeout=DEFAULT_TIMEOUT, max_workers=8, metrics=None, breaker=None):
+        self.base_url = base_url or ""
+        self.max_workers = max_workers
+        self.metrics = metrics
+        self.breaker = breaker
+        self.default_timeout = default_timeout
+        self.timeouts = dict(ENDPOINT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # health probes make a single attempt, without the retries above
+        self.probe_session = requests.Session()
+
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._executor = None
+
+    def timeout_for(self, endpoint):
+        return self.timeouts.get(endpoint, self.default_timeout)
+
+    def get(self, endpoint, params=None, **kwargs):
+        self._check_breaker(endpoint)
+        return self._request(self.session, "GET", endpoint, params=params, **kwargs)
+
+    def post(self, endpoint, json=None, **kwargs):
+        # POSTs are not retried by the adapter; callers that need retries make the request idempotent
+        self._check_breaker(endpoint)
+        return self._request(self.session, "POST", endpoint, json=json, **kwargs)
+
+    def ping(self, endpoint="status", timeout=(1, 2)):
+        # one attempt that bypasses the open breaker, whose state it then updates
+        return self._request(self.probe_session, "GET", endpoint, timeout=timeout)
+
+    def _check_breaker(self, endpoint):
+        if self.breaker is None:
+            return
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            if self.metrics is not None:
+                self.metrics.inc("backend_rejected_total", endpoint=endpoint)
+            raise
+
+    def _request(self, session, method, endpoint, **kwargs):
+        kwargs.setdefault("timeout", self.timeout_for(endpoint))
+        start = time.perf_counter()
+        try:
+            response = session.request(method, self.base_url + endpoint, **kwargs)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            self._record(endpoint, time.perf_counter() - start, error=True)
+            if self.breaker is not None:
+                if is_backend_failure(e):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+            raise
+        self._record(endpoint, time.perf_counter() - start, size=len(response.content))
+        if self.breaker is not None:
+            self.breaker.record_success()
+        return response
+
+    def get_json(self, endpoint, params=None, **kwargs):
+        return self.get(endpoint, params=params, **kwargs).json()
+
+    def fan_out(self, calls, window=None):
+        # Run independent calls (key -> zero-argument callable) and yield
+        # (key, result, error) as each one finishes, so the caller can render
+        # a result as soon as it arrives. A failing call only yields its error.
+        # At most window calls (max_workers by default) are queued at a time,
+        # so a large batch does not hold up other sessions' calls on the
+        # shared executor; closing the generator cancels the calls not yet started.
+        if self.max_workers <= 1 or len(calls) <= 1:
+            for key, call in calls.items():
+                try:
+                    yield key, call(), None
+                except Exception as e:
+                    yield key, None, e
+            return
+
+        pending = iter(calls.items())
+        futures = {}
+
+        def submit(count):
+            for key, call in islice(pending, count):
+                futures[self.executor.submit(call)] = key
+
+        submit(window or self.max_workers)
+        try:
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                submit(len(done))
+                for future in done:
+                    key = futures.pop(future)
+                    try:
+                        yield key, future.result(), None
+                    except Exception as e:
+                        yield key, None, e
+        finally:
+            for future in futures:
+                future.cancel()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="api")
+            return self._executor
+
+    def _record(self, endpoint, elapsed, error=False, size=None):
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {"calls": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            stats["calls"] += 1
+            stats["total_seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+            if error:
+                stats["errors"] += 1
+        logger.debug("{} took {:.3f}s{}".format(endpoint, elapsed, " (failed)" if error else ""))
+        if self.metrics is not None:
+            self.metrics.observe("backend_request_seconds", elapsed, endpoint=endpoint, outcome="error" if error else "ok")
+            if size is not None:
+                self.metrics.observe("backend_response_bytes", size, buckets=BYTE_BUCKETS, endpoint=endpoint)
+
+    def stats(self):
+        with self._lock:
+            snapshot = {endpoint: dict(stats) for endpoint, stats in self._stats.items()}
+        for stats in snapshot.values():
+            stats["avg_seconds"] = stats["total_seconds"] / stats["calls"] if stats["calls"] else 0.0
+        return snapshot
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self.session.close()
+        self.probe_session.close()
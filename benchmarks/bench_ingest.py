@@ -0,0 +1,53 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from ingest import events_frame
+from synthetic import make_events
+
+
+def json_round_trip(body):
+    # previous path: decode, encode the records again, let pandas decode them a second time
+    return pd.read_json(StringIO(json.dumps(json.loads(body)["data"])))
+
+
+def typed(body):
+    return events_frame(json.loads(body)["data"])
+
+
+PATHS = {"round-trip": json_round_trip, "typed": typed}
+
+
+def run(path, body):
+    tracemalloc.start()
+    start = time.perf_counter()
+    frame = PATHS[path](body)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, int(frame.memory_usage(index=True, deep=True).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the JSON round trip with typed DataFrame ingestion.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 500000])
+    args = parser.parse_args()
+
+    print("{:>8} {:>11} {:>9} {:>10} {:>10}".format("events", "path", "time s", "peak MB", "frame MB"))
+    for size in args.sizes:
+        body = json.dumps({"data": make_events(size)}).encode()
+        for path in PATHS:
+            elapsed, peak, frame_bytes = run(path, body)
+            print("{:>8} {:>11} {:>9.3f} {:>10.1f} {:>10.1f}".format(size, path, elapsed, peak / 1e6, frame_bytes / 1e6))
+
+
+if __name__ == "__main__":
+    main()
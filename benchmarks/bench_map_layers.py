@@ -0,0 +1,50 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import folium
+import pandas as pd
+
+from map_layers import add_crime_layers, add_event_layers, add_event_layers_per_row
+from synthetic import make_events
+
+NIGERIA_COORDINATES = [8.758432712612587, 15.367627426766712]
+PATHS = {
+    "per-row": add_event_layers_per_row,
+    "bulk": add_event_layers,
+    # nationwide level of detail, always aggregated
+    "binned": lambda event_map, crime_data: add_crime_layers(event_map, crime_data, zoom=6, point_threshold=0),
+}
+
+
+def run(path, crime_data):
+    start = time.perf_counter()
+    event_map = folium.Map(location=NIGERIA_COORDINATES, zoom_start=6)
+    PATHS[path](event_map, crime_data)
+    built = time.perf_counter()
+    html = event_map.get_root().render()
+    rendered = time.perf_counter()
+    return built - start, rendered - built, len(html.encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-row, bulk and binned folium layer construction.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--max-per-row", type=int, default=100000, help="skip the per-row path above this many events")
+    args = parser.parse_args()
+
+    print("{:>8} {:>8} {:>10} {:>10} {:>10}".format("events", "path", "build s", "render s", "html MB"))
+    for size in args.sizes:
+        crime_data = pd.DataFrame(make_events(size))
+        for path in PATHS:
+            if path == "per-row" and size > args.max_per_row:
+                continue
+            build, render, html_bytes = run(path, crime_data)
+            print("{:>8} {:>8} {:>10.3f} {:>10.3f} {:>10.2f}".format(size, path, build, render, html_bytes / 1e6))
+
+
+if __name__ == "__main__":
+    main()
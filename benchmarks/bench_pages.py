@@ -0,0 +1,153 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import mock_backend
+from synthetic import make_events_frame
+
+APP = os.path.join(ROOT, "main.py")
+
+# Drives each dashboard page through Streamlit's AppTest against the mock
+# backend and reports, per page, the cold (empty caches) and warm render time,
+# the peak Python memory of the cold run and the backend requests each run made.
+
+
+def widget(elements, label):
+    return next(element for element in elements if element.label == label)
+
+
+def open_page(at, page):
+    at.run()
+    if page != "Crime Overview":
+        at.sidebar.radio[0].set_value(page).run()
+    return at
+
+
+def overview(at):
+    return open_page(at, "Crime Overview")
+
+
+def overview_map(at):
+    open_page(at, "Crime Overview")
+    return widget(at.checkbox, "Show Map").check().run()
+
+
+def trends(at):
+    open_page(at, "Crime Overview")
+    widget(at.checkbox, "Show Trends").check().run()
+    # a filter change is answered from the cached counts
+    widget(at.sidebar.selectbox, "Select State").set_value("Borno").run()
+    return widget(at.radio, "Granularity").set_value("Weekly").run()
+
+
+def prediction(at):
+    open_page(at, "Crime Prediction")
+    return widget(at.button, "Predict Crime Rate").click().run()
+
+
+def outlook(at):
+    open_page(at, "Crime Prediction")
+    widget(at.radio, "Prediction Mode").set_value("Date Range").run()
+    return widget(at.button, "Predict Crime Outlook").click().run()
+
+
+def latest(at):
+    open_page(at, "Latest Crime Incidents")
+    return widget(at.button, "Get Latest Crimes").click().run()
+
+
+def report(at):
+    return open_page(at, "Report Crime")
+
+
+def dynamic_analysis(at):
+    open_page(at, "Dynamic Analysis")
+    widget(at.selectbox, "Select Analysis Type").set_value("All Analysis Types")
+    widget(at.selectbox, "Select Location").set_value("All States")
+    return widget(at.button, "Analyze").click().run()
+
+
+SCENARIOS = {
+    "overview": overview,
+    "overview+map": overview_map,
+    "trends": trends,
+    "prediction": prediction,
+    "outlook": outlook,
+    "latest": latest,
+    "report": report,
+    "dynamic": dynamic_analysis,
+}
+
+
+def request_counts(base_url):
+    return requests.get(base_url + mock_backend.REQUESTS_ENDPOINT, timeout=10).json()
+
+
+def run_scenario(name, base_url, timeout=300):
+    # one new session through the scenario; returns (seconds, requests made, failures)
+    os.environ["BASE_URL"] = base_url
+    before = request_counts(base_url)
+    start = time.perf_counter()
+    at = SCENARIOS[name](AppTest.from_file(APP, default_timeout=timeout))
+    elapsed = time.perf_counter() - start
+    after = request_counts(base_url)
+    # st.error is also used for content (predictions, incidents), only error messages count
+    failures = [element.value for element in at.exception]
+    failures += [element.value for element in at.error if element.value.startswith(("Error", "The server"))]
+    return elapsed, sum(after.values()) - sum(before.values()), failures
+
+
+def start_backend(args):
+    # an external mock (--base-url) keeps its threads out of the measured process
+    if args.base_url:
+        return None, args.base_url.rstrip("/") + "/"
+    backend = mock_backend.MockBackend(make_events_frame(args.events), latency=args.latency)
+    return mock_backend.start(backend)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render time, memory and backend requests of each dashboard page.")
+    parser.add_argument("scenarios", nargs="*", default=list(SCENARIOS), metavar="PAGE", help="any of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every mock response")
+    parser.add_argument("--base-url", help="use an already running mock_backend.py instead of starting one")
+    parser.add_argument("--repeat", type=int, default=3, help="warm runs per page")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error("unknown pages: {}".format(", ".join(sorted(unknown))))
+
+    server, base_url = start_backend(args)
+    print("{:>13} {:>8} {:>8} {:>9} {:>10} {:>10}".format("page", "cold s", "warm s", "peak MB", "cold reqs", "warm reqs"))
+    for name in args.scenarios:
+        # cold: a fresh process would have no shared clients or caches
+        st.cache_resource.clear()
+        st.cache_data.clear()
+        cold, cold_requests, failures = run_scenario(name, base_url)
+        warm = [run_scenario(name, base_url) for _ in range(args.repeat)]
+
+        st.cache_resource.clear()
+        tracemalloc.start()
+        run_scenario(name, base_url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print("{:>13} {:>8.3f} {:>8.3f} {:>9.1f} {:>10} {:>10}".format(
+            name, cold, min(seconds for seconds, _, _ in warm), peak / 1e6, cold_requests, max(count for _, count, _ in warm)))
+        for failure in failures + [failure for _, _, run_failures in warm for failure in run_failures]:
+            print("    failed: {}".format(failure))
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_pages import start_backend
+from load_test import free_port, run_scenario, start_app
+
+# Cold start of the dashboard: how long a fresh interpreter takes to import
+# main.py, how long `streamlit run` takes until it answers health checks, and
+# how long the first session waits for its first page. Run it again with
+# --root pointing at another checkout (e.g. a `git worktree` of an older
+# commit) to compare.
+
+# only needed by some pages, imported on first use
+DEFERRED_MODULES = ("folium", "streamlit_folium", "geopy", "altair", "map_layers")
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import main
+print(time.perf_counter() - start)
+print(" ".join(name for name in {deferred!r} if name in sys.modules))
+"""
+
+
+def measure_import(root):
+    # (seconds, deferred modules that were imported anyway) in a new interpreter
+    script = IMPORT_SCRIPT.format(deferred=DEFERRED_MODULES)
+    output = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, text=True, check=True).stdout
+    seconds, loaded = output.splitlines()[-2:]
+    return float(seconds), loaded.split()
+
+
+def measure_server(root, base_url):
+    # seconds until health checks pass, the first and the second session's Overview, and the first map
+    start = time.perf_counter()
+    process, app_url = start_app(base_url, free_port(), root=root)
+    try:
+        ready = time.perf_counter() - start
+        first, failures = run_scenario("overview", app_url)
+        second, more_failures = run_scenario("overview", app_url)
+        first_map, map_failures = run_scenario("overview+map", app_url)
+    finally:
+        process.terminate()
+        process.wait()
+    return ready, first, second, first_map, failures + more_failures + map_failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and time to first page of a fresh dashboard process.")
+    parser.add_argument("--root", default=ROOT, help="checkout whose main.py is measured")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--import-budget", type=float, default=1.5, help="seconds allowed for `import main`")
+    parser.add_argument("--skip-server", action="store_true", help="only measure the import")
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every mock response")
+    parser.add_argument("--base-url", help="use an already running mock_backend.py instead of starting one")
+    args = parser.parse_args()
+
+    imports = [measure_import(args.root) for _ in range(args.repeat)]
+    import_seconds = statistics.median(seconds for seconds, _ in imports)
+    loaded = sorted({name for _, names in imports for name in names})
+    print("import main: {:.3f}s median of {} (budget {:.1f}s)".format(import_seconds, args.repeat, args.import_budget))
+    if loaded:
+        print("    imported eagerly: {}".format(", ".join(loaded)))
+
+    if not args.skip_server:
+        server, base_url = start_backend(args)
+        try:
+            runs = [measure_server(args.root, base_url) for _ in range(args.repeat)]
+        finally:
+            if server is not None:
+                server.shutdown()
+        print("{:>14} {:>8} {:>8} {:>8}".format("", "median", "min", "max"))
+        for i, name in enumerate(["server ready", "first page", "second page", "first map"]):
+            values = [run[i] for run in runs]
+            print("{:>14} {:>8.3f} {:>8.3f} {:>8.3f}".format(name, statistics.median(values), min(values), max(values)))
+        for failure in sorted({failure for run in runs for failure in run[4]}):
+            print("    failed: {}".format(failure))
+
+    if import_seconds > args.import_budget or loaded:
+        print("Over the import budget." if import_seconds > args.import_budget else "Deferred modules were imported by main.py.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_client import ApiClient
+from ingest import ARROW_STREAM, JSON, PARQUET, events_frame_from_response
+import mock_backend
+from synthetic import make_events
+
+# (Accept, Accept-Encoding) sent for each transport
+TRANSPORTS = {
+    "json": (JSON, "identity"),
+    "json+gzip": (JSON, "gzip"),
+    "arrow+zstd": (ARROW_STREAM, "identity"),
+    "parquet+zstd": (PARQUET, "identity"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Payload size and decode time of /crime_events per transport.")
+    parser.add_argument("--events", type=int, nargs="+", default=[100000, 500000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print("{:>8} {:>13} {:>10} {:>11} {:>10}".format("events", "transport", "wire MB", "fetch s", "decode s"))
+    for size in args.events:
+        # nationwide, every year since 2010
+        server, base_url = mock_backend.start(mock_backend.MockBackend(make_events(size)))
+        client = ApiClient(base_url, default_timeout=(3.05, 300))
+        for transport, (accept, encoding) in TRANSPORTS.items():
+            fetches, decodes = [], []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                response = client.get("crime_events", params={"state": None}, headers={"Accept": accept, "Accept-Encoding": encoding})
+                response.content
+                fetched = time.perf_counter()
+                frame = events_frame_from_response(response)
+                decoded = time.perf_counter()
+                fetches.append(fetched - start)
+                decodes.append(decoded - fetched)
+            assert len(frame) == size
+            wire = int(response.headers["Content-Length"])
+            print("{:>8} {:>13} {:>10.2f} {:>11.3f} {:>10.3f}".format(size, transport, wire / 1e6, min(fetches), min(decodes)))
+        client.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
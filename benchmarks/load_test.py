@@ -0,0 +1,232 @@
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from websockets.sync.client import connect
+
+from bench_pages import request_counts, start_backend
+
+# N concurrent browser sessions against one `streamlit run main.py` process,
+# stepped up until the p95 scenario time breaks the target or throughput stops
+# growing. AppTest keeps process-wide state and cannot run sessions in
+# parallel, so each session here speaks Streamlit's websocket protocol: it
+# sends rerun requests with widget values and waits for script_finished.
+
+# each scenario is a new session: the first page load, then one rerun per
+# (widget label, value) step; True clicks buttons and ticks checkboxes
+SCENARIOS = {
+    "overview": [],
+    "overview+map": [("Show Map", True)],
+    "prediction": [("Go to", "Crime Prediction"), ("Predict Crime Rate", True)],
+    "latest": [("Go to", "Latest Crime Incidents"), ("Get Latest Crimes", True)],
+    "report": [("Go to", "Report Crime")],
+    "dynamic": [("Go to", "Dynamic Analysis"), ("Analyze", True)],
+}
+WIDGET_TYPES = ("radio", "selectbox", "checkbox", "button", "form_submit_button")
+
+
+class Session:
+    # one browser tab: widget ids are learned from the deltas of the previous run
+
+    def __init__(self, websocket, timeout):
+        self.websocket = websocket
+        self.timeout = timeout
+        self.widgets = {}
+        self.states = {}
+
+    def set(self, label, value):
+        kind, widget_id = self.widgets[label]
+        if kind in ("button", "form_submit_button"):
+            field = "trigger_value"
+        elif isinstance(value, bool):
+            field = "bool_value"
+        else:
+            field = "string_value"
+        self.states[widget_id] = (field, value)
+
+    def rerun(self):
+        # returns the failures reported by the run
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        message.rerun_script.page_script_hash = ""
+        for widget_id, (field, value) in self.states.items():
+            state = message.rerun_script.widget_states.widgets.add()
+            state.id = widget_id
+            setattr(state, field, value)
+        # button clicks only last for the run they trigger
+        self.states = {widget_id: state for widget_id, state in self.states.items() if state[0] != "trigger_value"}
+        self.websocket.send(message.SerializeToString())
+
+        failures = []
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(self.websocket.recv(timeout=self.timeout))
+            kind = forward.WhichOneof("type")
+            if kind == "script_finished":
+                if forward.script_finished not in (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_EARLY_FOR_RERUN):
+                    failures.append("script finished with status {}".format(forward.script_finished))
+                return failures
+            if kind != "delta" or forward.delta.WhichOneof("type") != "new_element":
+                continue
+            element = forward.delta.new_element
+            element_type = element.WhichOneof("type")
+            if element_type in WIDGET_TYPES:
+                widget = getattr(element, element_type)
+                self.widgets[widget.label] = (element_type, widget.id)
+            elif element_type == "exception":
+                failures.append("{}: {}".format(element.exception.type, element.exception.message))
+            elif element_type == "alert" and element.alert.format == element.alert.ERROR and element.alert.body.startswith(("Error", "The server")):
+                failures.append(element.alert.body)
+
+
+def run_scenario(name, app_url, timeout=120):
+    # one new session through the scenario; returns (seconds, failures)
+    start = time.perf_counter()
+    stream_url = app_url.replace("http", "ws", 1) + "_stcore/stream"
+    with connect(stream_url, subprotocols=["streamlit"], max_size=None, open_timeout=timeout) as websocket:
+        session = Session(websocket, timeout)
+        failures = session.rerun()
+        for label, value in SCENARIOS[name]:
+            session.set(label, value)
+            failures += session.rerun()
+    return time.perf_counter() - start, failures
+
+
+def user(scenarios, app_url, deadline, offset, results, lock):
+    # one simulated user cycling through the scenarios until the deadline
+    i = offset
+    while time.perf_counter() < deadline:
+        name = scenarios[i % len(scenarios)]
+        try:
+            elapsed, failures = run_scenario(name, app_url)
+        except Exception as e:
+            elapsed, failures = None, ["{}: {}".format(type(e).__name__, e)]
+        with lock:
+            results.append((name, elapsed, failures))
+        i += 1
+
+
+def rss_mb(pid):
+    # resident memory of the app process, Linux only
+    try:
+        with open("/proc/{}/status".format(pid)) as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, TypeError):
+        pass
+    return float("nan")
+
+
+def run_level(sessions, scenarios, app_url, base_url, duration, pid):
+    results, lock = [], threading.Lock()
+    before = sum(request_counts(base_url).values()) if base_url else 0
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(scenarios, app_url, start + duration, i, results, lock), daemon=True)
+               for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    requests_made = sum(request_counts(base_url).values()) - before if base_url else 0
+
+    times = sorted(elapsed for _, elapsed, failures in results if elapsed is not None and not failures)
+    return {
+        "sessions": sessions,
+        "completed": len(times),
+        "errors": sum(1 for _, elapsed, failures in results if elapsed is None or failures),
+        "throughput": len(times) / wall,
+        "p50": statistics.median(times) if times else float("inf"),
+        "p95": times[min(int(len(times) * 0.95), len(times) - 1)] if times else float("inf"),
+        "max": times[-1] if times else float("inf"),
+        "backend_rps": requests_made / wall,
+        "rss": rss_mb(pid),
+        "failures": sorted({failure for _, _, failures in results for failure in failures}),
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(base_url, port, root=ROOT):
+    # the dashboard in its own process, as in the container
+    env = dict(os.environ, BASE_URL=base_url)
+    command = [sys.executable, "-m", "streamlit", "run", os.path.join(root, "main.py"),
+               "--server.headless", "true", "--server.port", str(port), "--browser.gatherUsageStats", "false"]
+    process = subprocess.Popen(command, env=env, cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    app_url = "http://127.0.0.1:{}/".format(port)
+    for _ in range(120):
+        try:
+            if requests.get(app_url + "_stcore/health", timeout=1).ok:
+                return process, app_url
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.5)
+    process.kill()
+    raise RuntimeError("streamlit did not start on port {}".format(port))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find how many concurrent sessions one app process keeps up with.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--scenarios", nargs="+", default=["overview", "overview+map", "latest", "prediction"],
+                        metavar="PAGE", help="cycled by every session; any of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per concurrency level")
+    parser.add_argument("--slo", type=float, default=3.0, help="p95 seconds per scenario considered keeping up")
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every mock response")
+    parser.add_argument("--base-url", help="use an already running mock_backend.py instead of starting one")
+    parser.add_argument("--app-url", help="use an already running dashboard instead of starting one")
+    parser.add_argument("--port", type=int, help="port for the dashboard started by this script")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error("unknown pages: {}".format(", ".join(sorted(unknown))))
+
+    server, base_url = (None, None) if args.app_url and not args.base_url else start_backend(args)
+    process, app_url = (None, args.app_url.rstrip("/") + "/") if args.app_url else start_app(base_url, args.port or free_port())
+    try:
+        # a running container has warm caches; fill them once before measuring
+        for name in args.scenarios:
+            run_scenario(name, app_url)
+
+        print("{:>8} {:>9} {:>6} {:>11} {:>7} {:>7} {:>7} {:>11} {:>7}".format(
+            "sessions", "completed", "errors", "scenarios/s", "p50 s", "p95 s", "max s", "backend r/s", "RSS MB"))
+        best = None
+        for sessions in args.sessions:
+            level = run_level(sessions, args.scenarios, app_url, base_url, args.duration, process and process.pid)
+            print("{sessions:>8} {completed:>9} {errors:>6} {throughput:>11.2f} {p50:>7.2f} {p95:>7.2f} {max:>7.2f} {backend_rps:>11.1f} {rss:>7.0f}".format(**level))
+            for failure in level["failures"][:5]:
+                print("    failed: {}".format(failure))
+            if level["p95"] > args.slo or level["errors"] or (best and level["throughput"] < best["throughput"] * 1.1):
+                print("Saturated at {} sessions: p95 {:.2f}s, {:.2f} scenarios/s (best {:.2f} at {} sessions).".format(
+                    sessions, level["p95"], level["throughput"], (best or level)["throughput"], (best or level)["sessions"]))
+                break
+            best = level
+        else:
+            print("Kept up with {} sessions within a p95 of {:.1f}s.".format(args.sessions[-1], args.slo))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
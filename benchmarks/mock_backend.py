@@ -0,0 +1,328 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from ingest import ARROW_STREAM, EVENT_DTYPES, JSON, PARQUET, pa
+from synthetic import make_events_frame
+
+# Local stand-in for the crime backend, used to exercise the dashboard and the
+# benchmarks offline. Every endpoint main.py calls is answered from one
+# synthetic event table, and POST /reports stores reports by idempotency key.
+# /crime_events answers in Arrow IPC, Parquet or JSON depending on the Accept
+# header, and JSON bodies are gzipped when the client accepts it. Latency can
+# be added per endpoint to model a remote backend.
+
+# days in each crime change base period
+CHANGE_PERIODS = {"year": 365, "month": 30, "week": 7, "day": 1}
+# answered without being counted, for benchmarks that run the mock in another process
+REQUESTS_ENDPOINT = "_requests"
+
+
+def preferred_type(accept):
+    # highest-q media type out of the ones this server can produce
+    offered = [JSON] if pa is None else [ARROW_STREAM, PARQUET, JSON]
+    best, best_q = JSON, -1.0
+    for part in (accept or JSON).split(","):
+        media_type, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            q = float(params.strip()[2:])
+        if media_type in offered and q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+class MockBackend:
+
+    def __init__(self, events, arrow_compression="zstd", latency=0.0, jitter=0.0, endpoint_latency=None):
+        # events is a list of records or a DataFrame such as make_events_frame's
+        events = events.copy() if isinstance(events, pd.DataFrame) else pd.DataFrame.from_records(events)
+        events["event_date"] = pd.to_datetime(events["event_date"])
+        self.events = events
+        self.arrow_compression = arrow_compression
+        self.latency = latency
+        self.jitter = jitter
+        self.endpoint_latency = endpoint_latency or {}
+        self.requests = {}
+        self._responses = {}
+        self._by_recency = None
+        # submitted crime reports by idempotency key
+        self.reports = {}
+        self._lock = threading.Lock()
+
+    def count(self, endpoint):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def delay(self, endpoint):
+        # seconds to wait before answering
+        base = self.endpoint_latency.get(endpoint, self.latency)
+        return max(base + random.uniform(-self.jitter, self.jitter), 0.0) if base or self.jitter else 0.0
+
+    def filtered(self, state=None, actor1=None, event_type=None):
+        events = self.events
+        if state:
+            events = events[events["admin1"] == state]
+        if actor1:
+            events = events[events["actor1"] == actor1]
+        if event_type:
+            events = events[events["event_type"] == event_type]
+        return events
+
+    def crime_events(self, params):
+        events = self.filtered(params.get("state"))
+        if params.get("year"):
+            events = events[events["year"] == int(params["year"])]
+        if params.get("since"):
+            events = events[events["event_date"] >= pd.Timestamp(params["since"])]
+        return events
+
+    def encode_events(self, events, content_type):
+        if content_type == JSON:
+            return ('{"data": ' + events.to_json(orient="records", date_format="iso") + '}').encode()
+        # low-cardinality strings go over the wire dictionary encoded
+        events = events.astype({column: dtype for column, dtype in EVENT_DTYPES.items() if dtype == "category" and column in events})
+        table = pa.Table.from_pandas(events, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        if content_type == ARROW_STREAM:
+            options = pa.ipc.IpcWriteOptions(compression=self.arrow_compression)
+            with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+        else:
+            pa.parquet.write_table(table, sink, compression=self.arrow_compression or "none")
+        return sink.getvalue().to_pybytes()
+
+    @staticmethod
+    def top(column):
+        counts = column.value_counts()
+        counts = counts[counts > 0]
+        return counts.index[0] if len(counts) else None
+
+    def overview(self, endpoint, params):
+        if endpoint == "overview/historical":
+            events = self.filtered(params.get("location"), params.get("actor1"), params.get("event_type"))
+            counts = events.groupby("year").size()
+            return [{"year": int(year), "total_crimes": int(total)} for year, total in counts.items() if total]
+        if endpoint == "overview/most_active_actor":
+            return {"actor1": self.top(self.filtered(params.get("location"), event_type=params.get("event_type"))["actor1"])}
+        if endpoint == "overview/most_affected_lga":
+            return {"lga": self.top(self.filtered(params.get("state"), params.get("actor1"), params.get("event_type"))["admin2"])}
+        if endpoint == "overview/most_affected_state":
+            return {"state": self.top(self.filtered(None, params.get("actor1"), params.get("event_type"))["admin1"])}
+        if endpoint == "overview/rank":
+            counts = self.filtered(None, params.get("actor1"), params.get("event_type"))["admin1"].value_counts()
+            ranks = counts[counts > 0].rank(method="min", ascending=False)
+            return {"rank": int(ranks[params["state"]]) if params.get("state") in ranks else None}
+        return None
+
+    def predict(self, params):
+        # deterministic per (date, state) so cached and uncached answers agree
+        digest = hashlib.sha256("{}|{}".format(params.get("date"), params.get("state")).encode()).digest()
+        probability = round(0.5 + digest[0] / 510, 4)
+        return {"crime_prediction": digest[1] % 2, "probability": probability}
+
+    @staticmethod
+    def cursor(event):
+        return "{:%Y-%m-%d}|{}".format(event["event_date"], event["event_id_cnty"])
+
+    def latest_incidents(self, params):
+        # newest first, keyset paginated on (event_date, event_id_cnty): next_cursor
+        # passed as before= pages back, prev_cursor passed as after= fetches newer ones
+        with self._lock:
+            if self._by_recency is None:
+                self._by_recency = self.events.sort_values(["event_date", "event_id_cnty"], ascending=False, ignore_index=True)
+            events = self._by_recency
+        if params.get("state"):
+            events = events[events["admin1"] == params["state"]]
+        if params.get("actor1"):
+            events = events[events["actor1"] == params["actor1"]]
+        limit = int(params.get("limit", 10))
+        if params.get("after"):
+            day, event_id = params["after"].split("|", 1)
+            day = pd.Timestamp(day)
+            newer = events[(events["event_date"] > day) | ((events["event_date"] == day) & (events["event_id_cnty"] > event_id))]
+            # the page just after the cursor, so repeated calls catch up without gaps
+            page = newer.tail(limit)
+        else:
+            if params.get("before"):
+                day, event_id = params["before"].split("|", 1)
+                day = pd.Timestamp(day)
+                events = events[(events["event_date"] < day) | ((events["event_date"] == day) & (events["event_id_cnty"] < event_id))]
+            page = events.head(limit)
+
+        records = page[["event_id_cnty", "event_date", "location", "admin1", "actor1", "event_type", "notes", "source"]].to_dict("records")
+        cursors = {"prev_cursor": None, "next_cursor": None}
+        if records:
+            cursors = {"prev_cursor": self.cursor(records[0]), "next_cursor": self.cursor(records[-1])}
+        for record in records:
+            record["event_date"] = "{:%Y-%m-%d}".format(record["event_date"])
+        return records, cursors
+
+    def crime_change(self, endpoint, params):
+        # event counts in the base period ending on the reference date against the period before it
+        days = CHANGE_PERIODS.get(params.get("base"), 365)
+        reference = pd.Timestamp(params.get("reference_date") or self.events["event_date"].max())
+        current_start = reference - pd.Timedelta(days=days)
+        previous_start = current_start - pd.Timedelta(days=days)
+        events = self.filtered(params.get("location"))
+        events = events[(events["event_date"] > previous_start) & (events["event_date"] <= reference)]
+        current = events["event_date"] > current_start
+
+        field = {"crime_change_by_event_type": "event_type", "crime_change_by_actor": "actor1"}.get(endpoint, "admin1")
+        current_counts = events.loc[current, field].value_counts()
+        previous_counts = events.loc[~current, field].value_counts()
+        rows = []
+        for name in current_counts.index.union(previous_counts.index):
+            now, before = int(current_counts.get(name, 0)), int(previous_counts.get(name, 0))
+            if not now and not before:
+                continue
+            change = "N/A" if not before else round((now - before) / before * 100, 2)
+            rows.append({"location" if field == "admin1" else field: name, "change_percentage": change, "current_count": now})
+        return rows
+
+    def answer(self, endpoint, params):
+        # JSON body of every endpoint other than /crime_events, None when unknown
+        if endpoint == "status":
+            return {"status code": 200}
+        if endpoint in ("states", "actors", "event_types"):
+            column = {"states": "admin1", "actors": "actor1", "event_types": "event_type"}[endpoint]
+            return {endpoint: sorted(str(value) for value in self.events[column].unique())}
+        if endpoint.startswith("overview/"):
+            data = self.overview(endpoint, params)
+            return None if data is None else {"data": data}
+        if endpoint == "predict":
+            return {"data": self.predict(params)}
+        if endpoint == "incidents/latest":
+            records, cursors = self.latest_incidents(params)
+            return dict(cursors, data=records)
+        if endpoint in ("crime_change_by_event_type", "crime_change_by_actor", "crime_change_percentage"):
+            return self.crime_change(endpoint, params)
+        return None
+
+    def handle(self, endpoint, params, headers):
+        # returns (status, content type, body) for a GET request
+        if endpoint == REQUESTS_ENDPOINT:
+            with self._lock:
+                return 200, JSON, json.dumps(self.requests).encode()
+        if endpoint == "crime_events":
+            content_type = preferred_type(headers.get("Accept"))
+            return 200, content_type, self.encode_events(self.crime_events(params), content_type)
+
+        # the table never changes, so the small JSON answers are computed once
+        key = (endpoint, tuple(sorted(params.items())))
+        with self._lock:
+            body = self._responses.get(key)
+        if body is None:
+            data = self.answer(endpoint, params)
+            if data is None:
+                return 404, JSON, json.dumps({"detail": "Not Found"}).encode()
+            body = json.dumps(data).encode()
+            with self._lock:
+                self._responses[key] = body
+        return 200, JSON, body
+
+    def handle_post(self, endpoint, body):
+        # returns (status, content type, body) for a POST request
+        if endpoint != "reports":
+            return 404, JSON, json.dumps({"detail": "Not Found"}).encode()
+        try:
+            reports = json.loads(body)["reports"]
+            keys = [report["idempotency_key"] for report in reports]
+        except (ValueError, KeyError, TypeError):
+            return 422, JSON, json.dumps({"detail": "Expected {\"reports\": [...]} with an idempotency_key on each"}).encode()
+        with self._lock:
+            for key, report in zip(keys, reports):
+                # a report sent again is acknowledged without being stored twice
+                self.reports.setdefault(key, report)
+        return 200, JSON, json.dumps({"accepted": keys}).encode()
+
+
+def make_handler(backend):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            endpoint = url.path.strip("/")
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            if endpoint != REQUESTS_ENDPOINT:
+                backend.count(endpoint)
+                delay = backend.delay(endpoint)
+                if delay:
+                    time.sleep(delay)
+            status, content_type, body = backend.handle(endpoint, params, self.headers)
+            self.respond(status, content_type, body)
+
+        def do_POST(self):
+            endpoint = urlparse(self.path).path.strip("/")
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            backend.count(endpoint)
+            delay = backend.delay(endpoint)
+            if delay:
+                time.sleep(delay)
+            self.respond(*backend.handle_post(endpoint, body))
+
+        def respond(self, status, content_type, body):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            if content_type == JSON and "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body, compresslevel=5)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def start(backend, host="127.0.0.1", port=0):
+    # serve on a background thread; returns the server and its base URL
+    server = ThreadingHTTPServer((host, port), make_handler(backend))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://{}:{}/".format(host, server.server_address[1])
+
+
+def endpoint_latency(value):
+    # --endpoint-latency crime_events=0.5
+    endpoint, _, seconds = value.partition("=")
+    return endpoint.strip("/"), float(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a synthetic copy of the crime backend API.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--arrow-compression", choices=["zstd", "lz4", "none"], default="zstd")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform +/- seconds around the latency")
+    parser.add_argument("--endpoint-latency", type=endpoint_latency, action="append", default=[], metavar="ENDPOINT=SECONDS")
+    args = parser.parse_args()
+
+    compression = None if args.arrow_compression == "none" else args.arrow_compression
+    backend = MockBackend(make_events_frame(args.events, seed=args.seed), arrow_compression=compression,
+                          latency=args.latency, jitter=args.jitter, endpoint_latency=dict(args.endpoint_latency))
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), make_handler(backend))
+    print("Serving {} synthetic events on http://localhost:{}/ (set BASE_URL to this)".format(args.events, args.port))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+# rough bounding box of Nigeria
+LAT_RANGE = (4.3, 13.9)
+LON_RANGE = (2.7, 14.7)
+STATES = [
+    "Abia", "Adamawa", "Akwa Ibom", "Anambra", "Bauchi", "Bayelsa", "Benue", "Borno", "Cross River",
+    "Delta", "Ebonyi", "Edo", "Ekiti", "Enugu", "Federal Capital Territory", "Gombe", "Imo", "Jigawa",
+    "Kaduna", "Kano", "Katsina", "Kebbi", "Kogi", "Kwara", "Lagos", "Nasarawa", "Niger", "Ogun", "Ondo",
+    "Osun", "Oyo", "Plateau", "Rivers", "Sokoto", "Taraba", "Yobe", "Zamfara",
+]
+ACTORS = [
+    "Boko Haram - Jamaatu Ahli is-Sunna lid-Dawati wal-Jihad", "Islamic State West Africa Province (ISWAP)",
+    "Unidentified Armed Group (Nigeria)", "Fulani Ethnic Militia (Nigeria)", "Military Forces of Nigeria",
+    "Police Forces of Nigeria", "Protesters (Nigeria)", "Rioters (Nigeria)", "Vigilante Group (Nigeria)",
+]
+EVENT_TYPES = [
+    "Battles", "Violence against civilians", "Explosions/Remote violence", "Riots", "Protests", "Strategic developments",
+]
+
+
+def make_events(n, seed=0, start_year=2010, end_year=None):
+    # n ACLED-like event records, shaped like the /crime_events payload
+    rng = random.Random(seed)
+    end_year = end_year or date.today().year
+    first = date(start_year, 1, 1)
+    days = (min(date(end_year, 12, 31), date.today()) - first).days
+    events = []
+    for i in range(n):
+        state = rng.choice(STATES)
+        event_date = first + timedelta(days=rng.randrange(days + 1))
+        events.append({
+            "event_id_cnty": "NIG{}".format(i + 1),
+            "event_date": event_date.isoformat(),
+            "year": event_date.year,
+            "event_type": rng.choice(EVENT_TYPES),
+            "actor1": rng.choice(ACTORS),
+            "admin1": state,
+            "admin2": "{} LGA {}".format(state, rng.randint(1, 20)),
+            "location": "{} town {}".format(state, rng.randint(1, 200)),
+            "latitude": round(rng.uniform(*LAT_RANGE), 4),
+            "longitude": round(rng.uniform(*LON_RANGE), 4),
+            "fatalities": int(rng.expovariate(0.3)),
+            "notes": "Synthetic event {} in {}.".format(i + 1, state),
+            "source": "Synthetic",
+        })
+    return events
+
+
+def make_events_frame(n, seed=0, start_year=2010, end_year=None, lgas_per_state=20, towns_per_state=200):
+    # the same shape as make_events, generated column-wise so millions of rows take seconds;
+    # repeated strings are categoricals and event_date is a datetime column
+    rng = np.random.default_rng(seed)
+    end_year = end_year or date.today().year
+    first = np.datetime64(date(start_year, 1, 1).isoformat(), "D")
+    days = (min(date(end_year, 12, 31), date.today()) - date(start_year, 1, 1)).days
+    event_dates = first + rng.integers(0, days + 1, n).astype("timedelta64[D]")
+    state_codes = rng.integers(0, len(STATES), n)
+
+    def per_state(template, count):
+        # one category per (state, number), picked within the event's state
+        categories = [template.format(state, i + 1) for state in STATES for i in range(count)]
+        return pd.Categorical.from_codes(state_codes * count + rng.integers(0, count, n), categories)
+
+    notes = pd.Categorical.from_codes(state_codes, ["Synthetic event in {}.".format(state) for state in STATES])
+    return pd.DataFrame({
+        "event_id_cnty": pd.Series(np.arange(1, n + 1)).astype(str).radd("NIG"),
+        "event_date": pd.to_datetime(event_dates),
+        "year": pd.to_datetime(event_dates).year.astype("int16"),
+        "event_type": pd.Categorical.from_codes(rng.integers(0, len(EVENT_TYPES), n), EVENT_TYPES),
+        "actor1": pd.Categorical.from_codes(rng.integers(0, len(ACTORS), n), ACTORS),
+        "admin1": pd.Categorical.from_codes(state_codes, STATES),
+        "admin2": per_state("{} LGA {}", lgas_per_state),
+        "location": per_state("{} town {}", towns_per_state),
+        "latitude": rng.uniform(*LAT_RANGE, n).round(4).astype("float32"),
+        "longitude": rng.uniform(*LON_RANGE, n).round(4).astype("float32"),
+        "fatalities": rng.exponential(1 / 0.3, n).astype("int32"),
+        # free text stays a plain string column, the values are shared between rows
+        "notes": np.asarray(notes.astype(object)),
+        "source": pd.Categorical.from_codes(np.zeros(n, dtype=int), ["Synthetic"]),
+    })
@@ -0,0 +1,199 @@
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceCache:
+    # Cross-session cache for small lookup lists (states, actors, event types).
+    # Values are served from memory; once older than ttl the stale value is
+    # still returned while a background thread fetches a fresh one, so callers
+    # only ever block on the very first load of a name.
+
+    def __init__(self, loaders, ttl=3600):
+        self.loaders = loaders
+        self.ttl = ttl
+        self._values = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._load_locks = {name: threading.Lock() for name in loaders}
+
+    def get(self, name):
+        with self._lock:
+            entry = self._values.get(name)
+        if entry is None:
+            return self._load(name)
+
+        value, loaded_at = entry
+        if time.monotonic() - loaded_at > self.ttl:
+            self._refresh_in_background(name)
+        return value
+
+    def seed(self, values):
+        # serve values (name -> list, e.g. from a snapshot) without waiting for the
+        # loaders; they count as stale, so fresh ones are fetched in the background
+        stale = time.monotonic() - self.ttl - 1
+        with self._lock:
+            for name, value in values.items():
+                if name in self.loaders:
+                    self._values[name] = (value, stale)
+        for name in values:
+            if name in self.loaders:
+                self._refresh_in_background(name)
+
+    def warm_up(self, fan_out=None):
+        # load every list up front; fan_out (see ApiClient.fan_out) runs them concurrently
+        calls = {name: (lambda name=name: self._load(name)) for name in self.loaders}
+        if fan_out is None:
+            results = ((name, *self._try(call)) for name, call in calls.items())
+        else:
+            results = fan_out(calls)
+        for name, _, error in results:
+            if error is not None:
+                logger.error("Error warming up {} reference data: {}".format(name, error))
+
+    def _try(self, call):
+        try:
+            return call(), None
+        except Exception as e:
+            return None, e
+
+    def _load(self, name):
+        with self._load_locks[name]:
+            # another thread may have finished the same load while we waited
+            with self._lock:
+                entry = self._values.get(name)
+            if entry is not None and time.monotonic() - entry[1] <= self.ttl:
+                return entry[0]
+
+            value = self.loaders[name]()
+            with self._lock:
+                self._values[name] = (value, time.monotonic())
+            return value
+
+    def _refresh_in_background(self, name):
+        with self._lock:
+            if name in self._refreshing:
+                return
+            self._refreshing.add(name)
+        threading.Thread(target=self._refresh, args=(name,), name="refresh-{}".format(name), daemon=True).start()
+
+    def _refresh(self, name):
+        try:
+            self._load(name)
+        except Exception as e:
+            logger.warning("Error refreshing {} reference data, serving stale values: {}".format(name, e))
+        finally:
+            with self._lock:
+                self._refreshing.discard(name)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {name: {"size": len(value), "age_seconds": now - loaded_at, "refreshing": name in self._refreshing}
+                    for name, (value, loaded_at) in self._values.items()}
+
+
+def estimate_size(value):
+    # best-effort byte size of a cached value, DataFrames report their own memory use
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+class BoundedCache:
+    # Thread-safe LRU cache bounded by entry count and total bytes. Entries can
+    # carry their own ttl; an expired entry is a miss but stays in the cache as
+    # the last known-good value until it is replaced or evicted, and loads
+    # failing with one of the serve_stale_on exceptions return it instead of
+    # raising. Hit, miss, eviction and size counters are kept so the cache can
+    # be monitored.
+
+    def __init__(self, name, max_entries=64, max_bytes=256 * 1024 * 1024, serve_stale_on=()):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.serve_stale_on = serve_stale_on
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "stale_hits": 0}
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return default
+            value, size, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return value
+
+    def set(self, key, value, ttl=None, size=None):
+        if size is None:
+            size = estimate_size(value)
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                # never let a single oversized value flush the whole cache
+                logger.warning("Not caching {} entry {}: {} bytes exceeds the {} byte limit".format(self.name, key, size, self.max_bytes))
+                return value
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                evicted, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._counters["evictions"] += 1
+                logger.debug("Evicted {} entry {}".format(self.name, evicted))
+        return value
+
+    def get_or_load(self, key, loader, ttl=None):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = self.refresh(key, loader, ttl=ttl)
+        return value
+
+    def refresh(self, key, loader, ttl=None):
+        # always load and store; if the load fails the last stored value, expired or not, is served
+        try:
+            value = loader()
+        except self.serve_stale_on as e:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    raise
+                self._counters["stale_hits"] += 1
+            logger.warning("Serving stale {} entry {}: {}".format(self.name, key, e))
+            return entry[0]
+        return self.set(key, value, ttl=ttl)
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -5,5 +5,11 @@ if [ -f .env ]; then
   export $(cat .env | xargs)
 fi
 
-# Run the Streamlit app
-exec streamlit run main.py 
+# Run the Streamlit app; no file watcher in production, the code only changes with the image.
+# The port is fixed inside the container (nginx.conf points at app:8501), publish it elsewhere instead.
+exec streamlit run main.py \
+  --server.port 8501 \
+  --server.address 0.0.0.0 \
+  --server.headless true \
+  --server.fileWatcherType none \
+  --server.runOnSave false
@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from ingest import EVENT_DATE_COLUMNS, EVENT_DTYPES, HISTORICAL_DTYPES, accept_header, apply_dtypes, events_frame_from_response, pa
+
+logger = logging.getLogger(__name__)
+
+FIRST_YEAR = 2010
+# events are often added late with older dates, so every sync re-fetches this many days before the watermark
+LOOKBACK_DAYS = 90
+# events re-sent by the backend are recognised by their ACLED id
+EVENT_ID = "event_id_cnty"
+
+
+class EventStore:
+    # Local copy of the event table as Parquet files partitioned by year, kept
+    # up to date by incremental syncs: after the first full download only
+    # events dated on or after the sync watermark (the newest event date seen)
+    # minus lookback_days are requested, and re-sent events replace their
+    # stored copy. The Overview aggregates are then plain group-bys over the
+    # in-memory table.
+
+    def __init__(self, path, first_year=FIRST_YEAR, lookback_days=LOOKBACK_DAYS):
+        if pa is None:
+            raise RuntimeError("the local event store needs pyarrow")
+        self.path = path
+        self.first_year = first_year
+        self.lookback_days = lookback_days
+        self._frame = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    @property
+    def state_path(self):
+        return os.path.join(self.path, "sync.json")
+
+    def partition_path(self, year):
+        return os.path.join(self.path, "year={}".format(year), "events.parquet")
+
+    def sync_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    @property
+    def ready(self):
+        # the first full download has finished
+        return "synced_at" in self.sync_state()
+
+    def sync(self, client):
+        with self._sync_lock:
+            state = self.sync_state()
+            watermark = state.get("watermark")
+            since = None
+            if watermark is not None:
+                since = (date.fromisoformat(watermark) - timedelta(days=self.lookback_days)).isoformat()
+            first_year = self.first_year if since is None else max(self.first_year, int(since[:4]))
+            added = 0
+            for year in range(first_year, datetime.now().year + 1):
+                params = {"state": None, "year": year}
+                if since is not None:
+                    params["since"] = since
+                response = client.get("crime_events", params=params, headers={"Accept": accept_header()})
+                events = events_frame_from_response(response)
+                if not events.empty:
+                    # in case the backend ignores year or since
+                    events = events[events["event_date"].dt.year == year]
+                    if since is not None:
+                        events = events[events["event_date"] >= pd.Timestamp(since)]
+                if events.empty:
+                    continue
+                added += self._merge_partition(year, events)
+                newest = events["event_date"].max().date().isoformat()
+                watermark = max(watermark or newest, newest)
+
+            state = {"watermark": watermark, "synced_at": datetime.now().isoformat(timespec="seconds")}
+            tmp_path = self.state_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+            if added:
+                with self._lock:
+                    self._frame = None
+            logger.info("Event store synced {} new events, watermark {}".format(added, watermark))
+            return added
+
+    def _merge_partition(self, year, events):
+        path = self.partition_path(year)
+        before = 0
+        if os.path.exists(path):
+            existing = pd.read_parquet(path)
+            before = len(existing)
+            events = pd.concat([existing, events], ignore_index=True)
+        subset = [EVENT_ID] if EVENT_ID in events else None
+        events = events.drop_duplicates(subset=subset, keep="last")
+        events = apply_dtypes(events, EVENT_DTYPES, EVENT_DATE_COLUMNS)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        events.to_parquet(tmp_path, index=False, compression="zstd")
+        os.replace(tmp_path, path)
+        return len(events) - before
+
+    def start_sync(self, client, interval):
+        def run():
+            while True:
+                try:
+                    self.sync(client)
+                except Exception as e:
+                    logger.error("Error syncing event store: {}".format(e))
+                time.sleep(interval)
+
+        threading.Thread(target=run, name="event-store-sync", daemon=True).start()
+
+    def frame(self):
+        with self._lock:
+            if self._frame is None:
+                partitions = [pd.read_parquet(self.partition_path(year))
+                              for year in range(self.first_year, datetime.now().year + 1)
+                              if os.path.exists(self.partition_path(year))]
+                frame = pd.concat(partitions, ignore_index=True) if partitions else pd.DataFrame(columns=list(EVENT_DTYPES))
+                # categories differ between partitions, concat leaves them as objects
+                self._frame = apply_dtypes(frame, EVENT_DTYPES, EVENT_DATE_COLUMNS)
+            return self._frame
+
+    def overview(self, state=None, actor=None, event_type=None):
+        # the same aggregates as the /overview endpoints, for one filter combination
+        events = self.frame()
+        by_type = events if event_type is None else events[events["event_type"] == event_type]
+        by_actor = by_type if actor is None else by_type[by_type["actor1"] == actor]
+        selected = by_actor if state is None else by_actor[by_actor["admin1"] == state]
+
+        historical = selected.groupby("year", observed=True).size().rename("total_crimes").reset_index()
+        state_counts = counts(by_actor["admin1"])
+        if state is None:
+            ranking = state_counts.index[0] if len(state_counts) else None
+        else:
+            ranks = state_counts.rank(method="min", ascending=False)
+            ranking = int(ranks[state]) if state in ranks else None
+        actor_counts = counts((by_type if state is None else by_type[by_type["admin1"] == state])["actor1"])
+        lga_counts = counts(selected["admin2"])
+        return {
+            "historical": apply_dtypes(historical, HISTORICAL_DTYPES),
+            "ranking": ranking,
+            "most_active_actor": actor_counts.index[0] if len(actor_counts) else None,
+            "most_affected_lga": lga_counts.index[0] if len(lga_counts) else None,
+        }
+
+
+def counts(column):
+    # descending value counts without the empty categories
+    column_counts = column.value_counts()
+    return column_counts[column_counts > 0]
@@ -0,0 +1,83 @@
+import json
+import logging
+import math
+import os
+import threading
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "nigeria_admin_index.json")
+
+# bounds are [[south, west], [north, east]], the shape folium's fit_bounds takes
+Place = namedtuple("Place", ["name", "latitude", "longitude", "bounds"])
+
+
+def normalize(name):
+    name = " ".join(name.lower().replace("-", " ").split())
+    if name.endswith(" state"):
+        name = name[:-len(" state")]
+    return name
+
+
+def zoom_for_bounds(bounds, min_zoom=5, max_zoom=12):
+    # approximate web-mercator zoom at which the bounds fill the map
+    (south, west), (north, east) = bounds
+    span = max(north - south, east - west, 1e-6)
+    return min(max(int(math.log2(360 / span)), min_zoom), max_zoom)
+
+
+class GeoIndex:
+    # In-memory lookup of state (and optionally LGA) centroids and bounding
+    # boxes loaded from the bundled index file. Names missing from the file go
+    # to the optional geocoder once; its answer, found or not, is remembered.
+
+    def __init__(self, states, lgas=None, geocoder=None):
+        self._states = {}
+        for name, entry in states.items():
+            place = self._place(name, entry)
+            self._states[normalize(name)] = place
+            for alias in entry.get("aliases", []):
+                self._states[normalize(alias)] = place
+        self._lgas = {}
+        for state, entries in (lgas or {}).items():
+            for name, entry in entries.items():
+                self._lgas[(normalize(state), normalize(name))] = self._place(name, entry)
+        self._geocoder = geocoder
+        self._geocoded = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=INDEX_PATH, geocoder=None):
+        with open(path) as f:
+            index = json.load(f)
+        return cls(index["states"], index.get("lgas"), geocoder=geocoder)
+
+    @staticmethod
+    def _place(name, entry):
+        latitude, longitude = entry["centroid"]
+        return Place(name, latitude, longitude, entry.get("bounds"))
+
+    def lookup(self, name, state=None):
+        if state is None:
+            place = self._states.get(normalize(name))
+        else:
+            place = self._lgas.get((normalize(state), normalize(name)))
+        if place is not None or self._geocoder is None:
+            return place
+
+        query = name if state is None else "{}, {}".format(name, state)
+        with self._lock:
+            if query in self._geocoded:
+                return self._geocoded[query]
+        try:
+            place = self._geocoder(query)
+        except Exception as e:
+            logger.warning("Error geocoding {}: {}".format(query, e))
+            return None
+        with self._lock:
+            self._geocoded[query] = place
+        return place
+
+    def __len__(self):
+        return len({place.name for place in self._states.values()}) + len(self._lgas)
@@ -0,0 +1,63 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# since is when the backend entered its current state, error the last probe failure
+Health = namedtuple("Health", ["healthy", "checked_at", "since", "latency", "error"])
+
+
+class HealthMonitor:
+    # Probes the backend from one background thread and keeps the result, so
+    # every rerun of every session reads the cached status instead of making
+    # its own /status round trip. probe() raises or returns False when the
+    # backend is unhealthy.
+
+    def __init__(self, probe, interval=15):
+        self.probe = probe
+        self.interval = interval
+        self._health = Health(None, None, None, None, None)
+        self._lock = threading.Lock()
+        self._started = False
+
+    def check(self):
+        start = time.perf_counter()
+        try:
+            healthy, error = bool(self.probe()), None
+        except Exception as e:
+            healthy, error = False, e
+        latency = time.perf_counter() - start
+        now = datetime.now()
+        with self._lock:
+            previous = self._health
+            since = previous.since if previous.healthy == healthy else now
+            self._health = Health(healthy, now, since, latency, error)
+        if previous.healthy != healthy:
+            if healthy:
+                logger.info("Backend is healthy ({:.3f}s)".format(latency))
+            else:
+                logger.error("Backend is unhealthy: {}".format(error or "unexpected status"))
+        return healthy
+
+    def start(self):
+        # the first probe also runs in the background, so no render waits on
+        # it; until it finishes status().healthy is None
+        with self._lock:
+            if self._started:
+                return self
+            self._started = True
+
+        def run():
+            while True:
+                self.check()
+                time.sleep(self.interval)
+
+        threading.Thread(target=run, name="health-monitor", daemon=True).start()
+        return self
+
+    def status(self):
+        with self._lock:
+            return self._health
@@ -0,0 +1,83 @@
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    # columnar transport is optional, without pyarrow only JSON is requested
+    pa = None
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+PARQUET = "application/vnd.apache.parquet"
+JSON = "application/json"
+
+# compact dtypes for /crime_events records; repeated strings become categoricals
+EVENT_DTYPES = {
+    "event_type": "category",
+    "actor1": "category",
+    "admin1": "category",
+    "admin2": "category",
+    "location": "category",
+    "source": "category",
+    "latitude": "float32",
+    "longitude": "float32",
+    "fatalities": "int32",
+    "year": "int16",
+}
+EVENT_DATE_COLUMNS = ["event_date"]
+HISTORICAL_DTYPES = {"year": "int16", "total_crimes": "int64"}
+
+
+def apply_dtypes(frame, dtypes, date_columns=()):
+    # convert the columns that are present in place; unknown columns are left as parsed
+    for column, dtype in dtypes.items():
+        if column not in frame or frame[column].dtype == dtype:
+            continue
+        if dtype.startswith("int"):
+            # integer columns cannot hold nulls, missing counts are zero
+            frame[column] = pd.to_numeric(frame[column], errors="coerce").fillna(0).astype(dtype)
+        elif dtype.startswith("float"):
+            frame[column] = pd.to_numeric(frame[column], errors="coerce").astype(dtype)
+        else:
+            frame[column] = frame[column].astype(dtype)
+    for column in date_columns:
+        if column in frame:
+            frame[column] = pd.to_datetime(frame[column], errors="coerce")
+    return frame
+
+
+def events_frame(records):
+    # records are the already decoded "data" list, so there is no second JSON parse
+    frame = pd.DataFrame.from_records(records) if records else pd.DataFrame(columns=list(EVENT_DTYPES) + EVENT_DATE_COLUMNS)
+    return apply_dtypes(frame, EVENT_DTYPES, EVENT_DATE_COLUMNS)
+
+
+def historical_frame(records):
+    frame = pd.DataFrame.from_records(records) if records else pd.DataFrame(columns=list(HISTORICAL_DTYPES))
+    return apply_dtypes(frame, HISTORICAL_DTYPES)
+
+
+def accept_header():
+    # columnar formats first when they can be decoded, JSON is always acceptable
+    if pa is None:
+        return JSON
+    return "{}, {};q=0.9, {};q=0.5".format(ARROW_STREAM, PARQUET, JSON)
+
+
+def read_table(content, content_type):
+    # py_buffer wraps the body without copying it; compressed IPC buffers are decoded by pyarrow
+    buffer = pa.py_buffer(content)
+    if content_type == ARROW_STREAM:
+        return pa.ipc.open_stream(buffer).read_all()
+    return pa.parquet.read_table(pa.BufferReader(buffer))
+
+
+def events_frame_from_response(response):
+    # decode a /crime_events response in whichever format the server chose
+    content_type = response.headers.get("Content-Type", JSON).split(";")[0].strip()
+    if pa is None or content_type not in (ARROW_STREAM, PARQUET):
+        return events_frame(response.json()["data"])
+    # dictionary-encoded columns arrive as categoricals
+    frame = read_table(response.content, content_type).to_pandas(split_blocks=True, self_destruct=True)
+    return apply_dtypes(frame, EVENT_DTYPES, EVENT_DATE_COLUMNS)
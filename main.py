@@ -1,15 +1,23 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 import requests
 import streamlit as st
 import pandas as pd
-import folium
-from folium.plugins import MarkerCluster
-from streamlit_folium import st_folium
 import os
-import json
-from geopy.geocoders import Bing
+import html
+import sqlite3
 from dotenv import load_dotenv
 import logging 
+from logging.handlers import RotatingFileHandler
+from api_client import ApiClient, CircuitBreaker
+from cache import BoundedCache, ReferenceCache
+from geo_index import GeoIndex, Place, zoom_for_bounds
+from ingest import accept_header, events_frame_from_response, historical_frame
+from event_store import EventStore
+from metrics import registry, timing_logger
+from health import HealthMonitor
+from report_queue import QueueFullError, ReportQueue, new_idempotency_key, report_idempotency_key
+from snapshot import bins_frame, load_snapshot
+from trends import FREQUENCIES, actor_event_pivot, daily_counts, period_series, select
 
 load_dotenv()
 
@@ -17,53 +25,243 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 # set the log file name
 log_file = "app.log"
-# create a file handler
-handler = logging.FileHandler(log_file)
 # create a logging format
 formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-handler.setFormatter(formatter)
 
 bing_map_api = os.getenv('BING_MAP_API')
 BASE_URL = os.getenv('BASE_URL')
 NIGERIA_COORDINATES = [8.758432712612587, 15.367627426766712]
+# backend client settings
+API_TIMEOUT = float(os.getenv('API_TIMEOUT', 10))
+API_RETRIES = int(os.getenv('API_RETRIES', 3))
+API_POOL_SIZE = int(os.getenv('API_POOL_SIZE', 20))
+# concurrent backend calls per page render, 1 fetches sequentially
+API_MAX_WORKERS = int(os.getenv('API_MAX_WORKERS', 8))
+# backend health probe, cached for every session
+HEALTH_CHECK_INTERVAL = int(os.getenv('HEALTH_CHECK_INTERVAL', 15))
+HEALTH_CHECK_TIMEOUT = float(os.getenv('HEALTH_CHECK_TIMEOUT', 2))
+# consecutive failures before calls to the backend fail fast, and seconds until one is retried
+BREAKER_FAILURES = int(os.getenv('BREAKER_FAILURES', 5))
+BREAKER_RESET = int(os.getenv('BREAKER_RESET', 30))
+# last known-good Overview metrics per filter combination, served while the backend is down
+OVERVIEW_CACHE_ENTRIES = int(os.getenv('OVERVIEW_CACHE_ENTRIES', 512))
+# latest incidents pages, memoized per (state, actor, cursor); the first page expires after INCIDENT_TTL seconds
+INCIDENT_CACHE_ENTRIES = int(os.getenv('INCIDENT_CACHE_ENTRIES', 256))
+INCIDENT_TTL = int(os.getenv('INCIDENT_TTL', 60))
+INCIDENT_REFRESH_SECONDS = int(os.getenv('INCIDENT_REFRESH_SECONDS', 60))
+# submitted reports wait in this SQLite file until the background worker has sent them
+REPORT_QUEUE_PATH = os.getenv('REPORT_QUEUE_PATH', 'reports.sqlite3')
+REPORT_BATCH_SIZE = int(os.getenv('REPORT_BATCH_SIZE', 50))
+# new reports are refused while this many are still waiting to be sent
+REPORT_MAX_PENDING = int(os.getenv('REPORT_MAX_PENDING', 10000))
+REPORT_MAX_BACKOFF = int(os.getenv('REPORT_MAX_BACKOFF', 300))
+# precomputed default views written by snapshot.py, ignored once older than SNAPSHOT_MAX_AGE seconds
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', 'snapshot')
+SNAPSHOT_MAX_AGE = int(os.getenv('SNAPSHOT_MAX_AGE', 24 * 3600))
+# seconds between checks for a rebuilt snapshot
+SNAPSHOT_RELOAD = int(os.getenv('SNAPSHOT_RELOAD', 300))
+# seconds before the states/actors/event types lists are refreshed in the background
+REFERENCE_TTL = int(os.getenv('REFERENCE_TTL', 3600))
+# crime events cache limits; events of the current year expire after CRIME_DATA_TTL seconds
+CRIME_DATA_CACHE_ENTRIES = int(os.getenv('CRIME_DATA_CACHE_ENTRIES', 64))
+CRIME_DATA_CACHE_MB = int(os.getenv('CRIME_DATA_CACHE_MB', 512))
+CRIME_DATA_TTL = int(os.getenv('CRIME_DATA_TTL', 900))
+# the map draws individual events up to this many, aggregated grid cells above it
+MAP_POINT_THRESHOLD = int(os.getenv('MAP_POINT_THRESHOLD', 2000))
+# built maps kept in memory, keyed by (state, year)
+MAP_CACHE_ENTRIES = int(os.getenv('MAP_CACHE_ENTRIES', 16))
+# daily event counts behind the trend charts, keyed by (state, year) like the maps
+TREND_CACHE_ENTRIES = int(os.getenv('TREND_CACHE_ENTRIES', 64))
+# directory of a local copy of the events used for the Overview metrics, unset to query the backend
+LOCAL_EVENT_STORE = os.getenv('LOCAL_EVENT_STORE')
+EVENT_STORE_SYNC_INTERVAL = int(os.getenv('EVENT_STORE_SYNC_INTERVAL', 900))
+# days before the newest stored event that every sync fetches again, for events added late
+EVENT_STORE_LOOKBACK_DAYS = int(os.getenv('EVENT_STORE_LOOKBACK_DAYS', 90))
+# predictions are memoized per (date, state); a range covers at most PREDICTION_MAX_DAYS days
+PREDICTION_CACHE_ENTRIES = int(os.getenv('PREDICTION_CACHE_ENTRIES', 20000))
+PREDICTION_TTL = int(os.getenv('PREDICTION_TTL', 6 * 3600))
+PREDICTION_MAX_DAYS = int(os.getenv('PREDICTION_MAX_DAYS', 30))
+# crime change results are cached per (analysis, location, base, reference date)
+CHANGE_CACHE_ENTRIES = int(os.getenv('CHANGE_CACHE_ENTRIES', 1024))
+CHANGE_TTL = int(os.getenv('CHANGE_TTL', 900))
+# timings as JSON lines (opt-in, rotated at METRICS_LOG_MB), Prometheus text file and optional /metrics port
+METRICS_LOG = os.getenv('METRICS_LOG', '')
+METRICS_LOG_MB = int(os.getenv('METRICS_LOG_MB', 50))
+METRICS_FILE = os.getenv('METRICS_FILE', 'metrics.prom')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+SHOW_DIAGNOSTICS = os.getenv('SHOW_DIAGNOSTICS', '').lower() in ('1', 'true', 'yes')
+
+def has_file_handler(logger, path):
+    return any(getattr(handler, "baseFilename", None) == os.path.abspath(path) for handler in logger.handlers)
+
+@st.cache_resource
+def configure_logging():
+    # the script reruns on every interaction, so handlers are attached once per process;
+    # clearing the resource cache runs this again, existing handlers are kept
+    root = logging.getLogger()
+    if not has_file_handler(root, log_file):
+        handler = logging.FileHandler(log_file)
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+
+    if METRICS_LOG and not has_file_handler(timing_logger, METRICS_LOG):
+        timing_handler = RotatingFileHandler(METRICS_LOG, maxBytes=METRICS_LOG_MB * 1024 * 1024, backupCount=3)
+        timing_handler.setFormatter(logging.Formatter('%(message)s'))
+        timing_logger.addHandler(timing_handler)
+    timing_logger.propagate = False
+    registry.start_exporter(METRICS_FILE, METRICS_PORT)
+    return True
+
+def register_cache(cache):
+    # export the cache's counters as cache_<counter>{cache="<name>"} gauges
+    registry.register_collector(lambda: (("cache_" + name, {"cache": cache.name}, value) for name, value in cache.stats().items()))
+    return cache
+
+@st.cache_resource
+def get_api_client():
+    # shared by every session so connections to the backend are kept alive
+    breaker = CircuitBreaker(failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET)
+    registry.register_collector(lambda: [("backend_circuit_open", {}, float(breaker.is_open))])
+    return ApiClient(BASE_URL, pool_size=API_POOL_SIZE, retries=API_RETRIES, default_timeout=(3.05, API_TIMEOUT), max_workers=API_MAX_WORKERS, metrics=registry, breaker=breaker)
+
+@st.cache_resource
+def get_health_monitor():
+    client = get_api_client()
+
+    def probe():
+        timeout = (HEALTH_CHECK_TIMEOUT, HEALTH_CHECK_TIMEOUT)
+        return client.ping("status", timeout=timeout).json()["status code"] == 200
+
+    monitor = HealthMonitor(probe, interval=HEALTH_CHECK_INTERVAL)
+    registry.register_collector(lambda: [("backend_up", {}, float(bool(monitor.status().healthy)))])
+    return monitor.start()
+
+@st.cache_resource
+def get_reference_cache():
+    client = get_api_client()
+    cache = ReferenceCache({
+        "states": lambda: client.get_json("states")['states'],
+        "actors": lambda: client.get_json("actors")['actors'],
+        "event_types": lambda: client.get_json("event_types")['event_types'],
+    }, ttl=REFERENCE_TTL)
+    snapshot = get_snapshot()
+    if snapshot is not None and snapshot.meta.get("reference"):
+        # the first render uses the snapshot's lists and does not wait for the backend
+        cache.seed(snapshot.meta["reference"])
+    else:
+        # created once per process, so this warm-up runs at app startup
+        cache.warm_up(client.fan_out)
+    registry.register_collector(lambda: (
+        ("reference_" + stat, {"list": name}, float(value))
+        for name, stats in cache.stats().items() for stat, value in stats.items()
+    ))
+    return cache
+
+def load_reference_lists():
+    # every page reads the filter lists from the session, so load them before any page renders
+    cache = get_reference_cache()
+    for name in ("states", "actors", "event_types"):
+        try:
+            st.session_state[name] = ["All"] + cache.get(name)
+        except (requests.exceptions.RequestException, KeyError) as e:
+            st.error("Error fetching {} data: {}".format(name.replace("_", " "), e))
+            logging.error("Error fetching {} data: {}".format(name.replace("_", " "), e))
+            return False
+    return True
+
+def backend_degraded():
+    # read from the shared monitor and breaker, nothing is sent to the backend here
+    health = get_health_monitor().status()
+    # an unknown status (the first probe has not finished) is not shown as an outage
+    if health.healthy is not False and not get_api_client().breaker.is_open:
+        return False
+    since = " since {:%H:%M}".format(health.since) if health.since and not health.healthy else ""
+    st.warning("The crime data service is not responding{}. The dashboard is showing the most recent data it has, which may be out of date.".format(since))
+    return True
+
+@st.cache_resource
+def get_crime_data_cache():
+    return register_cache(BoundedCache("crime_events", max_entries=CRIME_DATA_CACHE_ENTRIES, max_bytes=CRIME_DATA_CACHE_MB * 1024 * 1024, serve_stale_on=requests.exceptions.RequestException))
+
+def bing_geocode(query):
+    # fallback for names missing from the bundled index
+    if not bing_map_api:
+        return None
+    from geopy.geocoders import Bing
+    location = Bing(api_key=bing_map_api).geocode(query + ", Nigeria")
+    if location is None:
+        return None
+    bbox = location.raw.get("bbox")
+    bounds = [[bbox[0], bbox[1]], [bbox[2], bbox[3]]] if bbox else None
+    return Place(query, location.latitude, location.longitude, bounds)
 
-def check_server_status():
+@st.cache_resource
+def get_geo_index():
+    return GeoIndex.load(geocoder=bing_geocode)
+
+@st.cache_resource
+def get_event_store():
+    if not LOCAL_EVENT_STORE:
+        return None
     try:
-        response = requests.get(BASE_URL + "status")
-        response.raise_for_status()
-        logging.info("Server status: {}".format(response.json()["status code"]))
-        return response.json()["status code"]
-    except requests.exceptions.RequestException as e:
-        logging.error("Error fetching server status: {}".format(e))
+        store = EventStore(LOCAL_EVENT_STORE, lookback_days=EVENT_STORE_LOOKBACK_DAYS)
+    except (RuntimeError, OSError) as e:
+        # missing pyarrow or an unusable directory; the Overview falls back to the backend
+        logging.error("Local event store disabled: {}".format(e))
         return None
+    store.start_sync(get_api_client(), EVENT_STORE_SYNC_INTERVAL)
+    return store
+
+def overview_from_store(store, state_filter, actor_filter, event_type_filter):
+    # same shape as the fan-out results, computed from the local copy without any request
+    try:
+        overview = store.overview(state_filter, actor_filter, event_type_filter)
+    except Exception as e:
+        yield "overview", None, e
+        return
+    yield "historical events", overview["historical"], None
+    yield "ranking", overview["ranking"], None
+    yield "most active actor", overview["most_active_actor"], None
+    yield "most affected LGA", overview["most_affected_lga"], None
+
+@st.cache_resource(ttl=SNAPSHOT_RELOAD)
+def get_snapshot():
+    # shared by every session; None when there is no recent snapshot
+    return load_snapshot(SNAPSHOT_DIR, max_age=SNAPSHOT_MAX_AGE) if SNAPSHOT_DIR else None
+
+def overview_from_snapshot(snapshot):
+    # the All/All/All Overview as precomputed by snapshot.py, without any request
+    overview = snapshot.meta["overview"]
+    yield "historical events", historical_frame(overview["historical events"]), None
+    for key in ("ranking", "most active actor", "most affected LGA"):
+        yield key, overview[key], None
 
-@st.cache_data
 def fetch_crime_data(state_filter, year):
-    params = {"state": state_filter}
-    if year != "All":
-        params["year"] = year
-    response = requests.get(BASE_URL + "crime_events", params=params)
-    response.raise_for_status()
-    return response.json()["data"]
+    cache = get_crime_data_cache()
+    client = get_api_client()
+
+    def load():
+        params = {"state": state_filter}
+        if year != "All":
+            params["year"] = year
+        # the server may answer in Arrow or Parquet instead of JSON when pyarrow is installed
+        response = client.get("crime_events", params=params, headers={"Accept": accept_header()})
+        with registry.timed("dataframe_build_seconds", frame="crime_events"):
+            data = events_frame_from_response(response)
+        logging.info("crime_events cache: {}".format(cache.stats()))
+        return data
+
+    # past years are final, only the current year (or all years) can still change;
+    # an expired frame is still served while the backend cannot be reached
+    ttl = CRIME_DATA_TTL if year == "All" or int(year) >= datetime.now().year else None
+    return cache.get_or_load((state_filter, year), load, ttl=ttl)
+
+@st.cache_resource
+def get_overview_cache():
+    return register_cache(BoundedCache("overview", max_entries=OVERVIEW_CACHE_ENTRIES, serve_stale_on=requests.exceptions.RequestException))
 
 def crime_overview():
-    try:
-        states = requests.get(BASE_URL + "states")
-        states.raise_for_status()
-        if states.status_code != 200:
-            st.error("Error fetching states data: {}".format(states.text))
-            logging.error("Error fetching states data: {}".format(states.text))
-            return
-        try:
-            st.session_state.states = ["All"] +  states.json()['states']
-        except KeyError:
-            st.error("Error fetching states data: {}".format(states.text))
-            logging.error("Error fetching states data: {}".format(states.text))
-            return
-    except requests.exceptions.RequestException as e:
-        st.error("Error fetching states data: {}".format(e))
-        logging.error("Error fetching states data: {}".format(e))
-        return
+    client = get_api_client()
 
     if 'state_filter' not in st.session_state:
         st.session_state.state_filter = "All"
@@ -73,24 +271,8 @@ def crime_overview():
         st.session_state.event_types_filter = "All"
 
     state_filter = st.sidebar.selectbox("Select State", st.session_state.states)
-
-    try:
-        actors = ["All"] + requests.get(BASE_URL + "actors").json()['actors']
-        st.session_state.actors = actors
-    except requests.exceptions.RequestException as e:
-        logging.error("Error fetching actors data: {}".format(e))
-        st.error("Error fetching actors data: {}".format(e))
-        return
-    actor_filter = st.sidebar.selectbox("Select Actor", actors)
-
-    try:
-        event_types = ["All"] + requests.get(BASE_URL + "event_types").json()['event_types']
-        st.session_state.event_types = event_types
-    except requests.exceptions.RequestException as e:
-        logging.error("Error fetching event types data: {}".format(e))  
-        st.error("Error fetching event types data: {}".format(e))
-        return
-    event_type_filter = st.sidebar.selectbox("Select Event Type", event_types)
+    actor_filter = st.sidebar.selectbox("Select Actor", st.session_state.actors)
+    event_type_filter = st.sidebar.selectbox("Select Event Type", st.session_state.event_types)
 
     st.session_state.state_filter = state_filter
     st.session_state.actors_filter = actor_filter
@@ -103,54 +285,63 @@ def crime_overview():
     if event_type_filter == "All":
         event_type_filter = None
 
-    try:
-        historical_events = requests.get(BASE_URL + "overview/historical", params={"location": state_filter, "actor1": actor_filter, "event_type": event_type_filter}).json()["data"]
-        if not historical_events:
-            st.warning("No historical events data available for the selected filters.")
-            logging.warning("No historical events data available for the selected filters.")    
-            st.session_state.historical_events = pd.DataFrame()  # Initialize as an empty DataFrame
-            return
-    except requests.exceptions.RequestException as e:
-        st.error("Error fetching historical events data: {}".format(e))
-        logging.error("Error fetching historical events data: {}".format(e))
-        return
+    def fetch_historical():
+        records = client.get_json("overview/historical", params={"location": state_filter, "actor1": actor_filter, "event_type": event_type_filter})["data"]
+        with registry.timed("dataframe_build_seconds", frame="historical"):
+            return historical_frame(records)
+
+    # every metric below only depends on the filters, so they are requested
+    # concurrently and each one is rendered as soon as its call returns
+    calls = {
+        "historical events": fetch_historical,
+        "most active actor": lambda: client.get_json("overview/most_active_actor", params={"location": state_filter, "event_type": event_type_filter})["data"]['actor1'],
+        "most affected LGA": lambda: client.get_json("overview/most_affected_lga", params={"state": state_filter, "actor1": actor_filter, "event_type": event_type_filter})['data']['lga'],
+    }
+    if state_filter:
+        calls["ranking"] = lambda: client.get_json("overview/rank", params={"state": state_filter, "actor1": actor_filter, "event_type": event_type_filter})["data"]["rank"]
+    else:
+        calls["ranking"] = lambda: client.get_json("overview/most_affected_state", params={"actor1": actor_filter, "event_type": event_type_filter})["data"]['state']
 
-    data = pd.read_json(json.dumps(historical_events))
-    num_incidences = data.total_crimes.sum()
-    st.session_state.historical_events = data
+    # every result is kept per filter combination and served if the next call fails
+    overview_cache = get_overview_cache()
+    filters = (state_filter, actor_filter, event_type_filter)
+    calls = {key: (lambda key=key, call=call: overview_cache.refresh((key,) + filters, call)) for key, call in calls.items()}
 
     col1, col2, col4 = st.columns([1, 1, 2])
     col3 = st.columns([1])[0]
 
-    col1.metric("Total Incidences", num_incidences)
-
-    try:
-        if state_filter:
-            rank = requests.get(BASE_URL + "overview/rank", params={"state": state_filter, "actor1": actor_filter, "event_type": event_type_filter}).json()["data"]["rank"]
-            col2.metric("State Rank", rank)
-        else:
-            most_affected_state = requests.get(BASE_URL + "overview/most_affected_state", params={"actor1": actor_filter, "event_type": event_type_filter}).json()["data"]['state']
-            col2.metric("Most Affected State", most_affected_state)
-    except requests.exceptions.RequestException as e:
-        logging.error("Error fetching ranking data: {}".format(e))
-        st.error("Error fetching ranking data: {}".format(e))
-        return
-
-    try:
-        most_active_actor = requests.get(BASE_URL + "overview/most_active_actor", params={"location": state_filter, "event_type": event_type_filter}).json()["data"]['actor1']
-        col3.metric("Most Active Actor", most_active_actor)
-    except requests.exceptions.RequestException as e:
-        logging.error("Error fetching most active actor data: {}".format(e))
-        st.error("Error fetching most active actor data: {}".format(e))
-        return
-
-    try:
-        most_affected_lga = requests.get(BASE_URL + "overview/most_affected_lga", params={"state": state_filter, "actor1": actor_filter, "event_type": event_type_filter}).json()['data']['lga']
-        col4.metric("Most Affected LGA", most_affected_lga)
-    except requests.exceptions.RequestException as e:
-        logging.error("Error fetching most affected LGA data: {}".format(e))
-        st.error("Error fetching most affected LGA data: {}".format(e))
-        return
+    store = get_event_store()
+    snapshot = get_snapshot()
+    if snapshot is not None and not any(filters):
+        results = overview_from_snapshot(snapshot)
+    elif store is not None and store.ready:
+        results = overview_from_store(store, state_filter, actor_filter, event_type_filter)
+    else:
+        results = client.fan_out(calls)
+
+    st.session_state.historical_events = pd.DataFrame()
+    for key, result, error in results:
+        if error is not None:
+            logging.error("Error fetching {} data: {}".format(key, error))
+            st.error("Error fetching {} data: {}".format(key, error))
+            continue
+
+        if key == "historical events":
+            if result.empty:
+                st.warning("No historical events data available for the selected filters.")
+                logging.warning("No historical events data available for the selected filters.")
+                continue
+            st.session_state.historical_events = result
+            col1.metric("Total Incidences", result.total_crimes.sum())
+        elif key == "ranking":
+            if state_filter:
+                col2.metric("State Rank", result)
+            else:
+                col2.metric("Most Affected State", result)
+        elif key == "most active actor":
+            col3.metric("Most Active Actor", result)
+        elif key == "most affected LGA":
+            col4.metric("Most Affected LGA", result)
 
 def plot_historical_bar():
     if 'historical_events' in st.session_state and not st.session_state.historical_events.empty:
@@ -159,7 +350,7 @@ def plot_historical_bar():
             st.subheader("Cumulative Crime Incidences for All States")
         else:
             st.subheader("Cumulative Crime Incidences for :blue[{}] State".format(st.session_state.state_filter))
-        st.bar_chart(data.set_index("year")["total_crimes"], use_container_width=True)
+        st.bar_chart(data.set_index("year")["total_crimes"], width="stretch")
     else:
         st.warning("No data available to display.")
 
@@ -169,10 +360,70 @@ def section_break():
 def plot_historical_line():
     if 'historical_events' in st.session_state and not st.session_state.historical_events.empty:
         data = st.session_state.historical_events
-        st.line_chart(data.set_index("year")["total_crimes"], use_container_width=True)
+        st.line_chart(data.set_index("year")["total_crimes"], width="stretch")
     else:
         st.warning("No data available to display.")
 
+def build_country_map(state_filter, year):
+    crime_data = fetch_crime_data(state_filter, year)
+    with registry.timed("map_build_seconds", state=state_filter or "All"):
+        return build_country_map_layers(crime_data, state_filter)
+
+def base_map(state_filter):
+    # the tiles, centred and zoomed on the state or the whole country; returns (map, zoom)
+    # the map stack takes longer to import than the rest of the app, so it is loaded by the first map only
+    import folium
+    place = get_geo_index().lookup(state_filter) if state_filter else None
+    if place is None:
+        if state_filter:
+            logging.warning("No coordinates found for {}, showing the whole country".format(state_filter))
+        zoom = 6
+        nigeria_map = folium.Map(location=NIGERIA_COORDINATES, zoom_start=zoom)
+    else:
+        zoom = zoom_for_bounds(place.bounds) if place.bounds else 9
+        nigeria_map = folium.Map(location=[place.latitude, place.longitude], zoom_start=zoom)
+        if place.bounds:
+            nigeria_map.fit_bounds(place.bounds)
+
+    folium.TileLayer('cartodbpositron').add_to(nigeria_map)
+    return nigeria_map, zoom
+
+def bins_legend(bins, cell_degrees):
+    return "Events are grouped into {:,} grid cells of {:g}°; the red circle size represents the number of events in the cell.".format(len(bins), cell_degrees)
+
+def build_country_map_layers(crime_data, state_filter):
+    from map_layers import add_crime_layers
+    nigeria_map, zoom = base_map(state_filter)
+    bins = None
+    if not crime_data.empty:
+        bins, cell_degrees = add_crime_layers(nigeria_map, crime_data, zoom, point_threshold=MAP_POINT_THRESHOLD)
+    if bins is None:
+        legend = "The red circle size represents the number of fatalities in the crime event."
+    else:
+        legend = bins_legend(bins, cell_degrees)
+    return nigeria_map, crime_data.shape[0], legend
+
+def build_snapshot_map(snapshot):
+    # the nationwide map from the snapshot's memory-mapped cells, no events are fetched
+    from map_layers import add_bin_layer
+    with registry.timed("map_build_seconds", state="All", source="snapshot"):
+        nigeria_map, _ = base_map(None)
+        bins = bins_frame(snapshot)
+        add_bin_layer(nigeria_map, bins)
+        return nigeria_map, snapshot.meta["events"], bins_legend(bins, snapshot.meta["cell_degrees"])
+
+@st.cache_resource
+def get_map_cache():
+    return register_cache(BoundedCache("crime_map", max_entries=MAP_CACHE_ENTRIES, serve_stale_on=requests.exceptions.RequestException))
+
+def get_country_map(state_filter, year):
+    # built maps are shared by (state, year) and expire together with their events
+    ttl = CRIME_DATA_TTL if int(year) >= datetime.now().year else None
+    snapshot = get_snapshot()
+    if state_filter is None and snapshot is not None and snapshot.bins is not None and snapshot.meta["year"] == int(year):
+        return get_map_cache().get_or_load(("snapshot", snapshot.meta["bins_file"]), lambda: build_snapshot_map(snapshot), ttl=ttl)
+    return get_map_cache().get_or_load((state_filter, year), lambda: build_country_map(state_filter, year), ttl=ttl)
+
 def display_country_map():
     try:
         state_filter = st.session_state.state_filter if st.session_state.state_filter != "All" else None
@@ -184,48 +435,164 @@ def display_country_map():
         if not year:
             year = datetime.now().year
 
-        crime_events = fetch_crime_data(state_filter, year)
-        crime_data = pd.read_json(json.dumps(crime_events))
-
-        st.write("Number of crime events: ", crime_data.shape[0])
-
-        if state_filter is None:
-            nigeria_map = folium.Map(location=NIGERIA_COORDINATES, zoom_start=6)
-        else:
-            geolocator = Bing(api_key=bing_map_api)
-            location = geolocator.geocode(state_filter + ", Nigeria")
-            nigeria_map = folium.Map(location=[location.latitude, location.longitude], zoom_start=9)
+        # let the user choose to display the map or not, nothing is fetched or built until they do
+        if not st.checkbox('Show Map'):
+            return
 
-        folium.TileLayer('cartodbpositron').add_to(nigeria_map)
-        marker_cluster = MarkerCluster().add_to(nigeria_map)
+        from streamlit_folium import st_folium
+        nigeria_map, num_events, legend = get_country_map(state_filter, year)
+        st.write("Number of crime events: ", num_events)
+        st.warning(legend)
+        # panning and zooming do not need to rerun the script
+        with registry.timed("map_render_seconds"):
+            st_folium(nigeria_map, width=1500, height=500, returned_objects=[])
+    except requests.exceptions.RequestException as e:
+        logging.error("Error fetching crime events data: {}".format(e))
+        st.error("Error fetching crime events data: {}".format(e))
 
-        st.warning("The red circle size represents the number of fatalities in the crime event.")
-        for index, row in crime_data.iterrows():
-            folium.Marker([row['latitude'], row['longitude']], popup=row['location']).add_to(marker_cluster)
-            folium.CircleMarker([row['latitude'], row['longitude']], radius=row["fatalities"] / 10, color='red', fill_color='red').add_to(nigeria_map)
+@st.cache_resource
+def get_trend_cache():
+    return register_cache(BoundedCache("trends", max_entries=TREND_CACHE_ENTRIES, serve_stale_on=requests.exceptions.RequestException))
+
+def build_daily_counts(state_filter, year):
+    crime_data = fetch_crime_data(state_filter, year)
+    with registry.timed("dataframe_build_seconds", frame="daily_counts"):
+        return daily_counts(crime_data)
+
+def fetch_daily_counts(state_filter, year):
+    # counts are built from the events already fetched for the map; the
+    # nationwide counts of a year also answer every state of that year
+    cache = get_trend_cache()
+    ttl = CRIME_DATA_TTL if int(year) >= datetime.now().year else None
+    if state_filter is not None:
+        counts = cache.get((state_filter, year))
+        if counts is not None:
+            return counts
+        if cache.get((None, year)) is not None or get_crime_data_cache().get((None, year)) is not None:
+            return select(fetch_daily_counts(None, year), state=state_filter)
+    return cache.get_or_load((state_filter, year), lambda: build_daily_counts(state_filter, year), ttl=ttl)
+
+def display_crime_trends():
+    try:
+        state_filter = st.session_state.state_filter if st.session_state.state_filter != "All" else None
+        actor_filter = st.session_state.actors_filter if st.session_state.actors_filter != "All" else None
+        event_type_filter = st.session_state.event_types_filter if st.session_state.event_types_filter != "All" else None
+        st.subheader("Crime Trends")
 
-        # let the user choose to display the map or not
-        if st.checkbox('Show Map'):
-            st_folium(nigeria_map, width=1500, height=500)
+        year = st.selectbox("Select Trend Year", list(range(datetime.now().year, 2009, -1)))
+        # like the map, nothing is fetched until the user asks for it
+        if not st.checkbox('Show Trends'):
+            return
+        col1, col2 = st.columns([1, 1])
+        frequency = col1.radio("Granularity", list(FREQUENCIES), horizontal=True)
+        window = col2.slider("Rolling average (periods)", 1, 12, 3)
+
+        # the filters only select from the cached counts, they never cause a request
+        counts = select(fetch_daily_counts(state_filter, year), actor=actor_filter, event_type=event_type_filter)
+        if counts.empty:
+            st.warning("No crime events for the selected filters in {}.".format(year))
+            return
+        with registry.timed("trend_compute_seconds", frequency=frequency):
+            series = period_series(counts, frequency, window)
+            pivot = actor_event_pivot(counts)
+
+        st.write("{} crime events, rolling average over {} period{}".format(frequency, window, "s" if window > 1 else ""))
+        st.line_chart(series[["events", "events_avg"]], width="stretch")
+        st.write("{} fatalities".format(frequency))
+        st.line_chart(series[["fatalities", "fatalities_avg"]], width="stretch")
+        st.write("Crime events by actor and event type")
+        st.dataframe(pivot, width="stretch")
     except requests.exceptions.RequestException as e:
         logging.error("Error fetching crime events data: {}".format(e))
         st.error("Error fetching crime events data: {}".format(e))
 
+@st.cache_resource
+def get_prediction_cache():
+    return register_cache(BoundedCache("predictions", max_entries=PREDICTION_CACHE_ENTRIES, serve_stale_on=requests.exceptions.RequestException))
+
+def fetch_prediction(client, cache, date, state):
+    # memoized per (date, state); safe to call from worker threads, the client and
+    # cache are resolved by the caller since the st.cache_resource getters need the script thread
+    def load():
+        data = client.get_json("predict", params={"date": date, "state": state})["data"]
+        return data["crime_prediction"], data["probability"]
+    return cache.get_or_load((str(date), state), load, ttl=PREDICTION_TTL)
+
 def predict_crime(date, state):
     try:
-        response = requests.get(BASE_URL + "predict", params={"date": date, "state": state})
-        response.raise_for_status()
-        data = response.json()["data"]
-        return data["crime_prediction"], data["probability"]
+        return fetch_prediction(get_api_client(), get_prediction_cache(), date, state)
     except requests.exceptions.RequestException as e:
         logging.error("Error fetching crime prediction: {}".format(e))
         st.error("Error fetching crime prediction: {}".format(e))
         return None, None
 
+def predict_crime_batch(dates, states, progress=None):
+    # every (date, state) pair, using at most half of the shared workers so other sessions' calls are not held up
+    client, cache = get_api_client(), get_prediction_cache()
+    calls = {(date, state): (lambda date=date, state=state: fetch_prediction(client, cache, date, state)) for date in dates for state in states}
+    rows, failed = [], 0
+    for done, ((date, state), result, error) in enumerate(client.fan_out(calls, window=max(1, API_MAX_WORKERS // 2)), 1):
+        if error is not None:
+            logging.error("Error fetching crime prediction for {} on {}: {}".format(state, date, error))
+            failed += 1
+        else:
+            prediction, probability = result
+            # the probability is for the predicted class, turn it into the probability of a crime
+            crime_probability = probability if prediction == 1 else 1 - probability
+            rows.append({"date": date.isoformat(), "state": state, "prediction": prediction, "crime_probability": round(crime_probability, 4)})
+        if progress is not None:
+            progress(done, len(calls))
+    results = pd.DataFrame(rows, columns=["date", "state", "prediction", "crime_probability"])
+    return results.sort_values(["date", "state"], ignore_index=True), failed
+
+def crime_outlook():
+    today = datetime.now().date()
+    dates = st.date_input("Select Date Range", value=(today, today + timedelta(days=PREDICTION_MAX_DAYS - 1)))
+    states = st.multiselect("Select States", st.session_state.states[1:], default=st.session_state.states[1:])
+
+    if st.button("Predict Crime Outlook"):
+        if len(dates) != 2 or not states:
+            st.warning("Please select a start date, an end date and at least one state.")
+            return
+        start, end = dates
+        if (end - start).days + 1 > PREDICTION_MAX_DAYS:
+            st.warning("Please select at most {} days.".format(PREDICTION_MAX_DAYS))
+            return
+
+        progress_bar = st.progress(0.0, text="Predicting...")
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        results, failed = predict_crime_batch(days, states, lambda done, total: progress_bar.progress(done / total, text="Predicted {} of {}".format(done, total)))
+        progress_bar.empty()
+        if failed:
+            st.warning("{} of {} predictions could not be fetched.".format(failed, len(days) * len(states)))
+        # kept in the session so the download button rerun does not lose them
+        st.session_state.crime_outlook = results
+
+    results = st.session_state.get("crime_outlook")
+    if results is None or results.empty:
+        return
+    import altair as alt
+    st.altair_chart(
+        alt.Chart(results).mark_rect().encode(
+            x=alt.X("date:T", title="Date"),
+            y=alt.Y("state:N", title="State"),
+            color=alt.Color("crime_probability:Q", title="Crime probability", scale=alt.Scale(scheme="reds", domain=[0, 1])),
+            tooltip=["date:T", "state:N", alt.Tooltip("crime_probability:Q", format=".0%")],
+        ),
+        width="stretch",
+    )
+    st.dataframe(results.pivot(index="state", columns="date", values="crime_probability"), width="stretch")
+    st.download_button("Download CSV", results.to_csv(index=False), file_name="crime_outlook.csv", mime="text/csv")
+
 def crime_prediction_page():
     st.title("Crime Prediction")
     # add a disclaimer
     st.info("Please note that this is a prediction and not a guarantee. The prediction is based on historical data and machine learning algorithms.")
+    mode = st.radio("Prediction Mode", ["Single Day", "Date Range"], horizontal=True)
+    if mode == "Date Range":
+        crime_outlook()
+        return
+
     date = st.date_input("Select Date", value=datetime.now())
     state = st.selectbox("Select State", st.session_state.states[1:])
 
@@ -238,27 +605,87 @@ def crime_prediction_page():
                 else:
                     st.success(f"There is a {probability * 100}% probability of no crime incident occurring in {state} on {date}.")
 
-def get_latest_crime(limit=10, state=None, actor1=None):
-    try:
-        params = {"limit": limit}
-        if state:
-            params["state"] = state
-        if actor1:
-            params["actor1"] = actor1
-        
-        response = requests.get(BASE_URL + "incidents/latest", params=params)
-        response.raise_for_status()
-        return response.json()["data"]
-    except requests.exceptions.RequestException as e:
-        logging.error("Error fetching latest crime incidents: {}".format(e))
-        st.error("Error fetching latest crime incidents: {}".format(e))
-        return None
+@st.cache_resource
+def get_incident_cache():
+    return register_cache(BoundedCache("incidents", max_entries=INCIDENT_CACHE_ENTRIES, serve_stale_on=requests.exceptions.RequestException))
+
+def fetch_incident_page(limit, state=None, actor1=None, before=None):
+    # one page of the feed, newest first; returns (incidents, cursors)
+    def load():
+        params = {"limit": limit, "state": state, "actor1": actor1, "before": before}
+        response = get_api_client().get_json("incidents/latest", params=params)
+        return response["data"], {"next": response.get("next_cursor"), "prev": response.get("prev_cursor")}
+    # pages behind a cursor never change, only the first page expires
+    ttl = INCIDENT_TTL if before is None else None
+    return get_incident_cache().get_or_load((state, actor1, before, limit), load, ttl=ttl)
+
+def fetch_newer_incidents(limit, state, actor1, after):
+    # every incident newer than the after cursor, newest first
+    incidents = []
+    while after:
+        response = get_api_client().get_json("incidents/latest", params={"limit": limit, "state": state, "actor1": actor1, "after": after})
+        incidents = response["data"] + incidents
+        if len(response["data"]) < limit or response.get("prev_cursor") in (None, after):
+            return incidents, response.get("prev_cursor") or after
+        after = response["prev_cursor"]
+    return incidents, after
+
+def incident_card(crime):
+    return ('<div style="padding: 0.75rem 1rem; margin-bottom: 0.5rem; border-radius: 0.5rem; background-color: rgba(255, 43, 43, 0.09); color: rgb(125, 53, 59);">'
+            f'<h3 style="margin: 0 0 0.25rem 0;">{html.escape(str(crime["event_date"]))}</h3>'
+            '<ul style="margin-bottom: 0;">'
+            f'<li><b>Location:</b> {html.escape(str(crime["location"]))}, {html.escape(str(crime["admin1"]))}</li>'
+            f'<li><b>Notes:</b> <span style="color: green;">{html.escape(str(crime["notes"]))}</span></li>'
+            f'<li><b>Source:</b> {html.escape(str(crime["source"]))}</li>'
+            '</ul></div>')
+
+def render_incidents(container, incidents):
+    # a batch is one markdown element, not one alert per incident
+    container.markdown("".join(incident_card(crime) for crime in incidents), unsafe_allow_html=True)
+
+def unseen(feed, incidents):
+    # drop incidents the feed already shows, by ACLED id
+    seen = {crime.get("event_id_cnty") for batch in feed["batches"] for crime in batch}
+    return [crime for crime in incidents if crime.get("event_id_cnty") is None or crime["event_id_cnty"] not in seen]
+
+def incident_feed(limit, state, actor1):
+    feed = st.session_state.incident_feed
+    if feed["auto_refresh"] and feed["prev"]:
+        try:
+            newer, feed["prev"] = fetch_newer_incidents(limit, state, actor1, feed["prev"])
+        except requests.exceptions.RequestException as e:
+            logging.error("Error refreshing latest crime incidents: {}".format(e))
+        else:
+            newer = unseen(feed, newer)
+            if newer:
+                feed["batches"].insert(0, newer)
+
+    count = st.empty()
+    container = st.container()
+    for batch in feed["batches"]:
+        render_incidents(container, batch)
+
+    if feed["next"] is None:
+        st.caption("No older incidents.")
+    elif st.button("Load older incidents"):
+        try:
+            older, cursors = fetch_incident_page(limit, state, actor1, before=feed["next"])
+        except requests.exceptions.RequestException as e:
+            logging.error("Error fetching older crime incidents: {}".format(e))
+            st.error("Error fetching older crime incidents: {}".format(e))
+        else:
+            older = unseen(feed, older)
+            # a backend without cursors answers with the first page again
+            feed["next"] = cursors["next"] if older else None
+            if older:
+                feed["batches"].append(older)
+                render_incidents(container, older)
+    count.write(f"Number of incidents retrieved: {sum(len(batch) for batch in feed['batches'])}")
 
-                
 def latest_crime_page():
     st.title("Latest Crime Incidents")
 
-    limit = st.number_input("Number of incidents to retrieve", min_value=1, max_value=100, value=10)
+    limit = st.number_input("Incidents per page", min_value=1, max_value=100, value=10)
     state = st.selectbox("Select State (Optional)", st.session_state.states[:])
     actor1 = st.selectbox("Select Actor (Optional)", st.session_state.actors[:])
     if actor1 == "All":
@@ -266,26 +693,64 @@ def latest_crime_page():
     if state == "All":
         state = None
 
+    fragment = getattr(st, "fragment", None)
+    auto_refresh = st.checkbox("Auto-refresh every {} seconds".format(INCIDENT_REFRESH_SECONDS), disabled=fragment is None,
+                               help=None if fragment else "Needs a Streamlit version with st.fragment.")
+
+    feed = st.session_state.get("incident_feed")
     if st.button("Get Latest Crimes"):
-        latest_crimes = get_latest_crime(limit, state, actor1)
-        if latest_crimes:
-            st.write(f"Number of incidents retrieved: {len(latest_crimes)}")
-            for crime in latest_crimes:
-                st.error(
-                    f"""
-                ### {crime['event_date']}
-                - **Location:** {crime['location']}, {crime['admin1']}
-                - **Notes:** :green[{crime['notes']}]
-                - **Source:** {crime['source']}
-                """)
-        else:
-            st.warning("No data available to display.")
-                
-                
+        try:
+            incidents, cursors = fetch_incident_page(limit, state, actor1)
+        except requests.exceptions.RequestException as e:
+            logging.error("Error fetching latest crime incidents: {}".format(e))
+            st.error("Error fetching latest crime incidents: {}".format(e))
+            return
+        feed = {"filters": (limit, state, actor1), "batches": [incidents] if incidents else [], "next": cursors["next"], "prev": cursors["prev"]}
+        st.session_state.incident_feed = feed
+    if feed is None or feed["filters"] != (limit, state, actor1):
+        return
+    if not feed["batches"]:
+        st.warning("No data available to display.")
+        return
+
+    feed["auto_refresh"] = auto_refresh and fragment is not None
+    if feed["auto_refresh"]:
+        # only the feed reruns on the timer, the rest of the page is left alone
+        fragment(incident_feed, run_every=INCIDENT_REFRESH_SECONDS)(limit, state, actor1)
+    elif fragment is not None:
+        # "Load older incidents" reruns just the feed
+        fragment(incident_feed)(limit, state, actor1)
+    else:
+        incident_feed(limit, state, actor1)
+
+@st.cache_resource
+def get_report_queue():
+    client = get_api_client()
+
+    def send(reports):
+        # the backend answers with the idempotency keys it has stored
+        return client.post("reports", json={"reports": reports}).json().get("accepted")
+
+    queue = ReportQueue(REPORT_QUEUE_PATH, batch_size=REPORT_BATCH_SIZE, max_pending=REPORT_MAX_PENDING, max_backoff=REPORT_MAX_BACKOFF)
+    registry.register_collector(lambda: (("report_queue_" + name, {}, float(value)) for name, value in queue.stats().items()))
+    return queue.start_worker(send)
+
 def report_crime_page():
     st.subheader('Report a Crime')
 
-    form = st.form(key='report_crime')
+    # the idempotency key is derived from the form contents and this salt, so
+    # submitting the same report twice from one session stores it once
+    if 'report_salt' not in st.session_state:
+        st.session_state.report_salt = new_idempotency_key()
+
+    try:
+        queue = get_report_queue()
+    except (OSError, sqlite3.Error) as e:
+        logging.error("Report queue unavailable: {}".format(e))
+        st.error("Reports cannot be saved at the moment: {}".format(e))
+        queue = None
+
+    form = st.form(key='report_crime', clear_on_submit=True)
     # select state
     state = form.selectbox('Select State', st.session_state.states[1:])
     # input LGA
@@ -304,11 +769,34 @@ def report_crime_page():
         name = form.text_input('Enter your name')
         contact = form.text_input('Enter your contact')
 
-    submit = form.form_submit_button('Report')
+    submit = form.form_submit_button('Report', disabled=queue is None)
 
     if submit:
-        created_at = str(datetime.now())
-        # TODO: send the report to the backend
+        if not report.strip():
+            st.warning("Please describe the crime in your report.")
+            return False
+        crime_report = {
+            "state": state,
+            "lga": lga,
+            "actor1": perpetrator,
+            "report": report,
+            "anonymous": anonym,
+            "name": name,
+            "contact": contact,
+        }
+        key = report_idempotency_key(crime_report, st.session_state.report_salt)
+        crime_report["created_at"] = str(datetime.now())
+        # queued locally and sent by the background worker, the form does not wait for the backend
+        try:
+            queue.enqueue(crime_report, idempotency_key=key)
+        except QueueFullError as e:
+            logging.error("Report queue is full: {}".format(e))
+            st.error("Too many reports are waiting to be sent. Please try again in a few minutes.")
+            return False
+        except sqlite3.Error as e:
+            logging.error("Error queueing report: {}".format(e))
+            st.error("Error saving your report: {}".format(e))
+            return False
         return report_submitted_page(state, lga, perpetrator, name, contact)
 
     return False
@@ -322,52 +810,63 @@ def report_submitted_page(state, lga, perpetrator, name=None, contact=None):
 
     return state, lga, perpetrator, name, contact
 
-def get_crime_change_by_event_type(location, base, reference_date=None):
-    try:
-        params = {"location": location, "base": base}
-        if reference_date:
-            params["reference_date"] = reference_date
-        response = requests.get(BASE_URL + "crime_change_by_event_type", params=params)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logging.error("Error fetching crime change by event type: {}".format(e))
-        st.error("Error fetching crime change by event type: {}".format(e))
-        return None
-
-def get_crime_change_by_actor(location, base, reference_date=None):
-    try:
-        params = {"location": location, "base": base}
-        if reference_date:
-            params["reference_date"] = reference_date
-        response = requests.get(BASE_URL + "crime_change_by_actor", params=params)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logging.error("Error fetching crime change by actor: {}".format(e))
-        st.error("Error fetching crime change by actor: {}".format(e))
-        return None
-
-def get_crime_change_percentage(location=None, base="year", reference_date=None):
-    try:
-        params = {"base": base}
-        if location:
-            params["location"] = location
-        if reference_date:
-            params["reference_date"] = reference_date
-        response = requests.get(BASE_URL + "crime_change_percentage", params=params)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logging.error("Error fetching crime change percentage: {}".format(e))
-        st.error("Error fetching crime change percentage: {}".format(e))
-        return None
+# analysis type -> (endpoint, field naming each card)
+CHANGE_ANALYSES = {
+    "Event Type Change": ("crime_change_by_event_type", "event_type"),
+    "Actor Change": ("crime_change_by_actor", "actor1"),
+    "Crime Change Percentage": ("crime_change_percentage", "location"),
+}
+ALL_ANALYSES = "All Analysis Types"
+ALL_LOCATIONS = "All States"
+
+@st.cache_resource
+def get_change_cache():
+    return register_cache(BoundedCache("crime_change", max_entries=CHANGE_CACHE_ENTRIES, serve_stale_on=requests.exceptions.RequestException))
+
+def fetch_crime_change(client, cache, analysis_type, location, base, reference_date=None):
+    # cached per (analysis, location, base, reference date); safe to call from worker threads,
+    # with the client and cache resolved in the script thread like fetch_prediction
+    endpoint = CHANGE_ANALYSES[analysis_type][0]
+    params = {"base": base}
+    if location:
+        params["location"] = location
+    if reference_date:
+        params["reference_date"] = reference_date
+    return cache.get_or_load((endpoint, location, base, reference_date), lambda: client.get_json(endpoint, params=params), ttl=CHANGE_TTL)
+
+def crime_change_sweep(tasks, base, reference_date=None):
+    # fetch every (analysis type, location) task concurrently, results in task order
+    client, cache = get_api_client(), get_change_cache()
+    calls = {task: (lambda task=task: fetch_crime_change(client, cache, task[0], task[1], base, reference_date)) for task in tasks}
+    results = {task: (result, error) for task, result, error in client.fan_out(calls)}
+    return [(task,) + results[task] for task in tasks]
+
+def change_card(item, label_field):
+    change_percentage = item['change_percentage']
+    if change_percentage in ["N/A", "NA"]:
+        change_percentage = 0
+    change_percentage = float(change_percentage)
+
+    arrow = "▼" if change_percentage < 0 else "▲"
+    color = "lightgreen" if change_percentage < 0 else "lightcoral"
+    if change_percentage == 0:
+        color = "lightblue"
+    return (f'<div style="border: 1px solid {color}; padding: 10px; border-radius: 5px; background-color: {color};">'
+            f'<p><b>{html.escape(str(item[label_field]))}</b></p>'
+            f'<p><b>{arrow} {change_percentage}%</b></p>'
+            f'<p><b>Current Count:</b> {item["current_count"]}</p>'
+            '</div>')
+
+def render_change_cards(data, label_field):
+    # the whole grid is one markdown element instead of one per card
+    cards = "".join(change_card(item, label_field) for item in data)
+    st.markdown(f'<div style="display: grid; grid-template-columns: repeat(3, 1fr); gap: 1rem;">{cards}</div>', unsafe_allow_html=True)
 
 def dynamic_analysis_page():
     st.title("Dynamic Crime Analysis")
 
-    analysis_type = st.selectbox("Select Analysis Type", ["Event Type Change", "Actor Change"])
-    location = st.selectbox("Select Location", st.session_state.states[1:])
+    analysis_type = st.selectbox("Select Analysis Type", list(CHANGE_ANALYSES) + [ALL_ANALYSES])
+    location = st.selectbox("Select Location", st.session_state.states[1:] + [ALL_LOCATIONS])
     base = st.selectbox("Select Base Period", ["year", "month", "week", "day"])
     reference_date = st.date_input("Select Reference Date (Optional)", value=None)
 
@@ -377,149 +876,78 @@ def dynamic_analysis_page():
             return
 
         reference_date_str = reference_date.strftime('%Y-%m-%d') if reference_date else None
-        
-        if analysis_type == "Event Type Change":
-            data = get_crime_change_by_event_type(location, base, reference_date_str)
-            if not data:
-                st.warning("No data available to display.")
-                return
-            # get leng of data
-            data_len = len(data)
-            # We need four columns per line, so we shall have data_len/4 lines
-            num_lines = data_len // 3
-            # We need to add one more line if there is a remainder
-            if data_len % 3:
-                num_lines += 1
-            # Loop through the data and display it in columns
-            for i in range(num_lines):
-                col1, col2, col3 = st.columns(3)
-                for j in range(3):
-                    index = i * 3 + j
-                    if index < data_len:
-                        item = data[index]
-                        col = col1 if j == 0 else col2 if j == 1 else col3
-                        change_percentage = item['change_percentage']
-                        if change_percentage in ["N/A", "NA"]:
-                            change_percentage = 0
-                        change_percentage = float(change_percentage)
-
-                        arrow = "▼" if change_percentage < 0 else "▲"
-                        color = "lightgreen" if change_percentage < 0 else "lightcoral"
-                        if change_percentage == 0:
-                            color = "lightblue"
-
-                        col.markdown(f"""
-                        <div style="border: 1px solid {color}; padding: 10px; border-radius: 5px; background-color: {color};">
-                            <p><b>{item['event_type']}</b></p>
-                            <p><b>{arrow} {change_percentage}%</b></p>
-                            <p><b>Current Count:</b> {item['current_count']}</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                # create a space between the rows
-                st.markdown("---")
-        
-        elif analysis_type == "Actor Change":
-            data = get_crime_change_by_actor(location, base, reference_date_str)
-            if not data:
-                st.warning("No data available to display.")
-                return
-            # get leng of data
-            data_len = len(data)
-            # We need four columns per line, so we shall have data_len/4 lines
-            num_lines = data_len // 3
-            # We need to add one more line if there is a remainder
-            if data_len % 3:
-                num_lines += 1
-            # Loop through the data and display it in columns
-            for i in range(num_lines):
-                col1, col2, col3 = st.columns(3)
-                for j in range(3):
-                    index = i * 3 + j
-                    if index < data_len:
-                        item = data[index]
-                        col = col1 if j == 0 else col2 if j == 1 else col3
-                        change_percentage = item['change_percentage']
-                        if change_percentage in ["N/A", "NA"]:
-                            change_percentage = 0
-                        change_percentage = float(change_percentage)
-
-                        arrow = "▼" if change_percentage < 0 else "▲"
-                        color = "lightgreen" if change_percentage < 0 else "lightcoral"
-                        if change_percentage == 0:
-                            color = "lightblue"
-
-                        col.markdown(f"""
-                        <div style="border: 1px solid {color}; padding: 10px; border-radius: 5px; background-color: {color};">
-                            <p><b>{item['actor1']}</b></p>
-                            <p><b>{arrow} {change_percentage}%</b></p>
-                            <p><b>Current Count:</b> {item['current_count']}</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                # create a space between the rows
-                st.markdown("---")
-                
-        
-        elif analysis_type == "Crime Change Percentage":
-            data = get_crime_change_percentage(location, base, reference_date_str)
-            print(data)
-            if not data:
-                st.warning("No data available to display.")
-                return
-            # get leng of data
-            data_len = len(data)
-            # We need four columns per line, so we shall have data_len/4 lines
-            num_lines = data_len // 3
-            # We need to add one more line if there is a remainder
-            if data_len % 3:
-                num_lines += 1
-            # Loop through the data and display it in columns
-            for i in range(num_lines):
-                col1, col2, col3 = st.columns(3)
-                for j in range(3):
-                    index = i * 3 + j
-                    if index < data_len:
-                        item = data[index]
-                        col = col1 if j == 0 else col2 if j == 1 else col3
-                        change_percentage = item['change_percentage']
-                        if change_percentage in ["N/A", "NA"]:
-                            change_percentage = 0
-                        change_percentage = float(change_percentage)
-
-                        arrow = "▼" if change_percentage < 0 else "▲"
-                        color = "lightgreen" if change_percentage < 0 else "lightcoral"
-                        if change_percentage == 0:
-                            color = "lightblue"
-
-                        col.markdown(f"""
-                        <div style="border: 1px solid {color}; padding: 10px; border-radius: 5px; background-color: {color};">
-                            <p><b>{item['location']}</b></p>
-                            <p><b>{arrow} {change_percentage}%</b></p>
-                            <p><b>Current Count:</b> {item['current_count']}</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                # create a space between the rows
-                st.markdown("---")
-
 
-def main():
-    st.sidebar.title("Navigation")
-    page = st.sidebar.radio("Go to", ["Crime Overview", "Crime Prediction", "Latest Crime Incidents", "Report Crime", "Dynamic Analysis"])
-    st.header(":flag-ng: NIGERIA CRIME INCIDENCE DASHBOARD")
-    
-    # check if the server is running
-    status = check_server_status()
-    if status != 200:
-        st.error("The server is currently down. Please try again later.")
-        logging.error("The server is currently down. Please try again later.")
-        return
-    
+        analysis_types = list(CHANGE_ANALYSES) if analysis_type == ALL_ANALYSES else [analysis_type]
+        tasks = []
+        for analysis in analysis_types:
+            if location != ALL_LOCATIONS:
+                tasks.append((analysis, location))
+            elif analysis == "Crime Change Percentage":
+                # without a location the backend already returns every state
+                tasks.append((analysis, None))
+            else:
+                tasks.extend((analysis, state) for state in st.session_state.states[1:])
+
+        for (analysis, task_location), data, error in crime_change_sweep(tasks, base, reference_date_str):
+            if len(tasks) > 1:
+                st.subheader("{} - {}".format(analysis, task_location or ALL_LOCATIONS))
+            if error is not None:
+                logging.error("Error fetching {} for {}: {}".format(analysis.lower(), task_location, error))
+                st.error("Error fetching {}: {}".format(analysis.lower(), error))
+            elif not data:
+                st.warning("No data available to display.")
+            else:
+                render_change_cards(data, CHANGE_ANALYSES[analysis][1])
+            # create a space between the results
+            st.markdown("---")
+
+
+def diagnostics_page():
+    st.subheader("Diagnostics")
+    st.caption("Process-wide since the server started; shared by every session.")
+
+    rows = []
+    for (name, labels), histogram in sorted(registry.histograms().items()):
+        if not histogram.count:
+            continue
+        scale = 1 if name.endswith("_bytes") else 1000
+        rows.append({
+            "metric": name,
+            "labels": ", ".join("{}={}".format(key, value) for key, value in labels),
+            "count": histogram.count,
+            "avg": histogram.sum / histogram.count * scale,
+            "p50": histogram.quantile(0.5) * scale,
+            "p95": histogram.quantile(0.95) * scale,
+            "max": histogram.max * scale,
+        })
+    timings = pd.DataFrame(rows, columns=["metric", "labels", "count", "avg", "p50", "p95", "max"])
+    st.write("Timings (ms)")
+    st.dataframe(timings[~timings["metric"].str.endswith("_bytes")], hide_index=True, width="stretch")
+    st.write("Payload sizes (bytes)")
+    st.dataframe(timings[timings["metric"].str.endswith("_bytes")], hide_index=True, width="stretch")
+
+    gauges = pd.DataFrame(
+        [{"metric": name, "labels": ", ".join("{}={}".format(key, value) for key, value in labels), "value": value}
+         for (name, labels), value in sorted(registry.gauges().items())],
+        columns=["metric", "labels", "value"],
+    )
+    st.write("Caches")
+    st.dataframe(gauges, hide_index=True, width="stretch")
+
+    exposition = registry.render_prometheus()
+    with st.expander("Prometheus exposition"):
+        st.code(exposition, language="text")
+    st.download_button("Download metrics", exposition, file_name="metrics.prom", mime="text/plain")
+
+def render_page(page):
     if page == "Crime Overview":
         crime_overview()
         section_break()
         plot_historical_bar()
         plot_historical_line()
         section_break()
+        display_crime_trends()
+        section_break()
         display_country_map()
     elif page == "Crime Prediction":
         crime_prediction_page()
@@ -529,6 +957,32 @@ def main():
         report_crime_page()
     elif page == "Dynamic Analysis":
         dynamic_analysis_page()
+    elif page == "Diagnostics":
+        diagnostics_page()
+
+def main():
+    configure_logging()
+    # starts the worker at startup, so reports left from a previous run are sent without a visit to the form;
+    # only the report form depends on the queue, the other pages still render when it cannot be opened
+    try:
+        get_report_queue()
+    except (OSError, sqlite3.Error) as e:
+        logging.error("Report queue unavailable: {}".format(e))
+    pages = ["Crime Overview", "Crime Prediction", "Latest Crime Incidents", "Report Crime", "Dynamic Analysis"]
+    if SHOW_DIAGNOSTICS:
+        pages.append("Diagnostics")
+    st.sidebar.title("Navigation")
+    page = st.sidebar.radio("Go to", pages)
+    st.header(":flag-ng: NIGERIA CRIME INCIDENCE DASHBOARD")
+    
+    # a down backend degrades the pages to cached data instead of stopping them
+    backend_degraded()
+
+    if not load_reference_lists():
+        return
+
+    with registry.timed("rerun_seconds", page=page):
+        render_page(page)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,140 @@
+import folium
+import numpy as np
+import pandas as pd
+from branca.element import MacroElement
+from folium.plugins import FastMarkerCluster, MarkerCluster
+from jinja2 import Template
+
+# builds one clustered marker per row of [lat, lon, popup text]
+MARKER_CALLBACK = """function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindPopup(document.createTextNode(row[2]));
+    return marker;
+}"""
+# 5 decimal places is roughly 1m, more only inflates the page
+COORDINATE_DECIMALS = 5
+# above this many events the map shows grid cells instead of individual events
+POINT_THRESHOLD = 2000
+# upper bound on cells sent to the browser; the grid is coarsened until it fits
+MAX_BINS = 3000
+# grid cell size in degrees per zoom level, from ~55km nationwide to ~2km street level
+ZOOM_BIN_DEGREES = {5: 0.5, 6: 0.25, 7: 0.125, 8: 0.0625, 9: 0.03, 10: 0.015, 11: 0.0075}
+
+
+class CircleLayer(MacroElement):
+    # Draws every circle of a [[lat, lon, radius(, tooltip)], ...] array in one client-side
+    # loop on a shared canvas renderer, instead of one folium object (and one
+    # block of generated JS) per circle.
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = (function() {
+            var renderer = L.canvas();
+            var options = {{ this.options|tojson }};
+            var data = {{ this.data|tojson }};
+            var group = L.featureGroup();
+            for (var i = 0; i < data.length; i++) {
+                var row = data[i];
+                var circle = L.circleMarker([row[0], row[1]], Object.assign({radius: row[2], renderer: renderer}, options));
+                if (row.length > 3) {
+                    circle.bindTooltip(row[3]);
+                }
+                circle.addTo(group);
+            }
+            return group;
+        })().addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, data, color="red", fill_color="red", fill_opacity=0.2, **options):
+        super().__init__()
+        self._name = "CircleLayer"
+        self.data = data
+        self.options = dict(options, color=color, fillColor=fill_color, fillOpacity=fill_opacity)
+
+
+def event_columns(crime_data):
+    # coordinate, popup and radius arrays for every event that can be placed on the map
+    events = crime_data.dropna(subset=["latitude", "longitude"])
+    lat = events["latitude"].to_numpy(dtype=float).round(COORDINATE_DECIMALS)
+    lon = events["longitude"].to_numpy(dtype=float).round(COORDINATE_DECIMALS)
+    radius = (events["fatalities"].fillna(0).to_numpy(dtype=float) / 10).round(2)
+    popups = events["location"].astype(str).to_numpy()
+    return lat, lon, radius, popups
+
+
+def add_event_layers(event_map, crime_data):
+    # bulk path: a FastMarkerCluster and a single CircleLayer built from column arrays
+    lat, lon, radius, popups = event_columns(crime_data)
+    markers = list(zip(lat.tolist(), lon.tolist(), popups.tolist()))
+    FastMarkerCluster(markers, callback=MARKER_CALLBACK).add_to(event_map)
+    CircleLayer(np.column_stack([lat, lon, radius]).tolist()).add_to(event_map)
+    return event_map
+
+
+def bin_degrees_for_zoom(zoom):
+    zoom = min(max(zoom, min(ZOOM_BIN_DEGREES)), max(ZOOM_BIN_DEGREES))
+    return ZOOM_BIN_DEGREES[zoom]
+
+
+def aggregate_events(crime_data, cell_degrees, max_bins=MAX_BINS):
+    # Square grid aggregation: event count, fatality sum and mean position per
+    # cell. Returns the cells and the cell size actually used.
+    events = crime_data.dropna(subset=["latitude", "longitude"])
+    lat = events["latitude"].to_numpy(dtype=float)
+    lon = events["longitude"].to_numpy(dtype=float)
+    fatalities = events["fatalities"].fillna(0).to_numpy(dtype=float)
+    while True:
+        cells = pd.DataFrame({
+            "row": np.floor(lat / cell_degrees).astype(np.int64),
+            "col": np.floor(lon / cell_degrees).astype(np.int64),
+            "latitude": lat,
+            "longitude": lon,
+            "fatalities": fatalities,
+        })
+        bins = cells.groupby(["row", "col"], sort=False).agg(
+            events=("latitude", "size"),
+            fatalities=("fatalities", "sum"),
+            latitude=("latitude", "mean"),
+            longitude=("longitude", "mean"),
+        )
+        if len(bins) <= max_bins:
+            return bins.reset_index(drop=True), cell_degrees
+        cell_degrees *= 2
+
+
+def add_bin_layer(event_map, bins):
+    # circle area grows with the number of events in the cell
+    radius = (4 + 3 * np.sqrt(bins["events"].to_numpy(dtype=float))).clip(max=40).round(1)
+    tooltips = ["{:,} events, {:,} fatalities".format(events, int(fatalities))
+                for events, fatalities in zip(bins["events"].tolist(), bins["fatalities"].tolist())]
+    data = np.column_stack([
+        bins["latitude"].to_numpy().round(COORDINATE_DECIMALS),
+        bins["longitude"].to_numpy().round(COORDINATE_DECIMALS),
+        radius,
+    ]).tolist()
+    for row, tooltip in zip(data, tooltips):
+        row.append(tooltip)
+    CircleLayer(data, fill_opacity=0.4).add_to(event_map)
+    return event_map
+
+
+def add_crime_layers(event_map, crime_data, zoom, point_threshold=POINT_THRESHOLD):
+    # Level of detail: individual events up to point_threshold, otherwise grid
+    # cells sized from the zoom level, so the page stays bounded however many
+    # events there are. Returns the cells and cell size, or (None, None) when
+    # individual events were drawn.
+    if len(crime_data) <= point_threshold:
+        add_event_layers(event_map, crime_data)
+        return None, None
+    bins, cell_degrees = aggregate_events(crime_data, bin_degrees_for_zoom(zoom))
+    add_bin_layer(event_map, bins)
+    return bins, cell_degrees
+
+
+def add_event_layers_per_row(event_map, crime_data):
+    # original path with two folium objects per event, kept as the benchmark baseline
+    marker_cluster = MarkerCluster().add_to(event_map)
+    for index, row in crime_data.iterrows():
+        folium.Marker([row['latitude'], row['longitude']], popup=row['location']).add_to(marker_cluster)
+        folium.CircleMarker([row['latitude'], row['longitude']], radius=row["fatalities"] / 10, color='red', fill_color='red').add_to(event_map)
+    return event_map
@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# seconds; also used for byte sizes with BYTE_BUCKETS
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+# timings are written one JSON object per line by this logger
+timing_logger = logging.getLogger("metrics")
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        # linear interpolation inside the bucket, like Prometheus' histogram_quantile
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, bound in enumerate(self.buckets):
+            if seen + self.counts[i] >= rank:
+                # never above the largest value actually observed
+                return min(lower + (bound - lower) * (rank - seen) / max(self.counts[i], 1), self.max)
+            seen += self.counts[i]
+            lower = bound
+        return self.max
+
+
+class MetricsRegistry:
+    # Process-wide histograms, counters and gauges keyed by (name, labels).
+    # Collectors are called at export time for values owned elsewhere, such as
+    # cache statistics.
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._collectors = []
+        self._exporting = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def register_collector(self, collector):
+        # collector() returns an iterable of (name, labels dict, value) gauges
+        with self._lock:
+            self._collectors.append(collector)
+
+    @contextmanager
+    def timed(self, name, **labels):
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(name, elapsed, **labels)
+            timing_logger.info(json.dumps(dict(labels, metric=name, seconds=round(elapsed, 6), failed=failed)))
+
+    def histograms(self):
+        with self._lock:
+            return {key: histogram for key, histogram in self._histograms.items()}
+
+    def gauges(self):
+        with self._lock:
+            gauges = dict(self._gauges)
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                for name, labels, value in collector():
+                    gauges[self._key(name, labels)] = value
+            except Exception as e:
+                logging.getLogger(__name__).warning("Error collecting metrics: {}".format(e))
+        return gauges
+
+    def render_prometheus(self):
+        lines = []
+        for (name, labels), histogram in sorted(self.histograms().items()):
+            cumulative = 0
+            for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                cumulative += count
+                lines.append("{}_bucket{} {}".format(name, format_labels(labels + (("le", str(bound)),)), cumulative))
+            lines.append("{}_sum{} {}".format(name, format_labels(labels), histogram.sum))
+            lines.append("{}_count{} {}".format(name, format_labels(labels), histogram.count))
+        with self._lock:
+            counters = dict(self._counters)
+        for (name, labels), value in sorted(counters.items()):
+            lines.append("{}{} {}".format(name, format_labels(labels), value))
+        for (name, labels), value in sorted(self.gauges().items()):
+            lines.append("{}{} {}".format(name, format_labels(labels), value))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def start_exporter(self, path=None, port=None, interval=15):
+        # rewrite the text file every interval seconds and/or serve it on :port/metrics;
+        # only the first call starts anything, the registry is process-wide
+        with self._lock:
+            if self._exporting:
+                return
+            self._exporting = True
+        if path:
+            def run():
+                while True:
+                    try:
+                        self.write(path)
+                    except OSError as e:
+                        logging.getLogger(__name__).warning("Error writing metrics to {}: {}".format(path, e))
+                    time.sleep(interval)
+
+            threading.Thread(target=run, name="metrics-file", daemon=True).start()
+        if port:
+            server = ThreadingHTTPServer(("0.0.0.0", port), make_handler(self))
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(key, str(value).replace('"', '\\"')) for key, value in labels) + "}"
+
+
+def make_handler(registry):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+PENDING, SENT, REJECTED = "pending", "sent", "rejected"
+# client errors that are worth retrying; any other 4xx answer rejects the batch for good
+RETRYABLE_STATUSES = (408, 425, 429)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    sent_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS reports_due ON reports (status, next_attempt_at);
+"""
+
+
+class QueueFullError(Exception):
+    # too many reports are waiting to be sent; the caller should ask the user to retry later
+    pass
+
+
+def new_idempotency_key():
+    return uuid.uuid4().hex
+
+
+def report_idempotency_key(report, salt):
+    # the same report from the same salt (e.g. one per session) always gets the same key
+    payload = json.dumps(report, sort_keys=True, default=str)
+    return hashlib.sha256((salt + payload).encode("utf-8")).hexdigest()
+
+
+class ReportQueue:
+    # Durable outbox for crime reports. enqueue() only writes a row to a local
+    # SQLite database in WAL mode, so the form returns at once and a report
+    # survives restarts. A background worker sends due reports to the backend
+    # in batches; failed batches are retried with exponential backoff. Every
+    # report carries an idempotency key, so a batch that reached the backend
+    # but whose answer was lost can be sent again safely, also by another
+    # replica sharing the database.
+
+    def __init__(self, path, batch_size=50, max_pending=10000, max_backoff=300, lease=120):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff
+        # claimed reports are not picked up again for this many seconds, in case the worker dies mid-send
+        self.lease = lease
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        # WAL lets the worker read while a script thread writes; the mode is stored in the file
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+
+    def _connect(self):
+        # one connection per thread; sqlite3 connections cannot be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # a committed report is on disk before enqueue returns
+            connection.execute("PRAGMA synchronous=FULL")
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+        return connection
+
+    def _transaction(self):
+        return _Transaction(self._connect())
+
+    def enqueue(self, report, idempotency_key=None):
+        # returns the idempotency key; enqueueing the same key twice stores the report once
+        key = idempotency_key or new_idempotency_key()
+        now = time.time()
+        with self._transaction() as connection:
+            pending = connection.execute("SELECT COUNT(*) FROM reports WHERE status = ?", (PENDING,)).fetchone()[0]
+            if pending >= self.max_pending:
+                raise QueueFullError("{} reports are already waiting to be sent".format(pending))
+            connection.execute(
+                "INSERT OR IGNORE INTO reports (idempotency_key, payload, created_at, next_attempt_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(report), now, now),
+            )
+        self._wake.set()
+        return key
+
+    def claim(self):
+        # due pending reports, leased to this worker until they are marked
+        now = time.time()
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT id, idempotency_key, payload, attempts FROM reports WHERE status = ? AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (PENDING, now, self.batch_size),
+            ).fetchall()
+            connection.executemany("UPDATE reports SET next_attempt_at = ? WHERE id = ?", [(now + self.lease, row["id"]) for row in rows])
+        return rows
+
+    def mark_sent(self, ids):
+        with self._transaction() as connection:
+            connection.executemany("UPDATE reports SET status = ?, sent_at = ?, last_error = NULL WHERE id = ?",
+                                   [(SENT, time.time(), report_id) for report_id in ids])
+
+    def mark_rejected(self, ids, error):
+        with self._transaction() as connection:
+            connection.executemany("UPDATE reports SET status = ?, last_error = ? WHERE id = ?", [(REJECTED, str(error), report_id) for report_id in ids])
+
+    def mark_failed(self, rows, error):
+        # retry later, backing off exponentially with jitter up to max_backoff seconds
+        now = time.time()
+        updates = []
+        for row in rows:
+            attempts = row["attempts"] + 1
+            delay = min(2 ** attempts, self.max_backoff) * random.uniform(0.5, 1.0)
+            updates.append((attempts, now + delay, str(error), row["id"]))
+        with self._transaction() as connection:
+            connection.executemany("UPDATE reports SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?", updates)
+
+    def send_due(self, send):
+        # send one batch; send(reports) returns the accepted idempotency keys, or None for all of them
+        rows = self.claim()
+        if not rows:
+            return 0
+        reports = [dict(json.loads(row["payload"]), idempotency_key=row["idempotency_key"]) for row in rows]
+        try:
+            accepted = send(reports)
+        except requests.exceptions.RequestException as e:
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if status is not None and 400 <= status < 500 and status not in RETRYABLE_STATUSES:
+                logger.error("Backend rejected {} reports: {}".format(len(rows), e))
+                self.mark_rejected([row["id"] for row in rows], e)
+            else:
+                logger.warning("Error sending {} reports, will retry: {}".format(len(rows), e))
+                self.mark_failed(rows, e)
+            return 0
+
+        if accepted is None:
+            sent = rows
+        else:
+            accepted = set(accepted)
+            sent = [row for row in rows if row["idempotency_key"] in accepted]
+            if len(sent) < len(rows):
+                self.mark_failed([row for row in rows if row["idempotency_key"] not in accepted], "not accepted by the backend")
+        self.mark_sent([row["id"] for row in sent])
+        logger.info("Sent {} reports".format(len(sent)))
+        return len(sent)
+
+    def start_worker(self, send, interval=5):
+        # a full batch is followed straight away by the next one; otherwise wait for new reports or the interval
+        with self._lock:
+            if self._started:
+                return self
+            self._started = True
+
+        def run():
+            while True:
+                try:
+                    if self.send_due(send) == self.batch_size:
+                        continue
+                except Exception as e:
+                    logger.error("Error in the report queue worker: {}".format(e))
+                self._wake.wait(interval)
+                self._wake.clear()
+
+        threading.Thread(target=run, name="report-queue", daemon=True).start()
+        return self
+
+    def status(self, idempotency_key):
+        with self._transaction() as connection:
+            row = connection.execute("SELECT status FROM reports WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+        return row["status"] if row else None
+
+    def stats(self):
+        with self._transaction() as connection:
+            counts = dict(connection.execute("SELECT status, COUNT(*) FROM reports GROUP BY status").fetchall())
+            oldest = connection.execute("SELECT MIN(created_at) FROM reports WHERE status = ?", (PENDING,)).fetchone()[0]
+        stats = {status: counts.get(status, 0) for status in (PENDING, SENT, REJECTED)}
+        stats["oldest_pending_seconds"] = time.time() - oldest if oldest else 0.0
+        return stats
+
+
+class _Transaction:
+    # with-block that commits on success and rolls back on error; BEGIN IMMEDIATE
+    # takes the write lock up front so concurrent writers wait instead of failing
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        return False
@@ -0,0 +1,138 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from api_client import ApiClient
+from ingest import accept_header, events_frame_from_response
+
+logger = logging.getLogger(__name__)
+
+META_FILE = "meta.json"
+# map cells as rows of these float64 columns, memory-mapped by the dashboard
+BIN_COLUMNS = ["latitude", "longitude", "events", "fatalities"]
+# zoom of the nationwide map, see base_map in main.py
+COUNTRY_ZOOM = 6
+
+# meta is the parsed meta.json, bins the memory-mapped cells or None
+Snapshot = namedtuple("Snapshot", ["meta", "bins"])
+
+
+def build_snapshot(client, path, year=None, point_threshold=None):
+    # Precompute what a new session sees first: the filter lists, the
+    # Overview metrics for the All/All/All filters and the aggregated
+    # nationwide map of the current year. Files are written next to each
+    # other and meta.json is replaced last, so readers never see a
+    # half-written snapshot.
+    # imported here so the dashboard can load snapshots without the map stack
+    from map_layers import POINT_THRESHOLD, aggregate_events, bin_degrees_for_zoom
+    if point_threshold is None:
+        point_threshold = POINT_THRESHOLD
+    year = year or datetime.now().year
+    os.makedirs(path, exist_ok=True)
+    started = time.perf_counter()
+
+    overview = {
+        "historical events": client.get_json("overview/historical")["data"],
+        "ranking": client.get_json("overview/most_affected_state")["data"]["state"],
+        "most active actor": client.get_json("overview/most_active_actor")["data"]["actor1"],
+        "most affected LGA": client.get_json("overview/most_affected_lga")["data"]["lga"],
+    }
+
+    reference = {
+        "states": client.get_json("states")["states"],
+        "actors": client.get_json("actors")["actors"],
+        "event_types": client.get_json("event_types")["event_types"],
+    }
+
+    response = client.get("crime_events", params={"year": year}, headers={"Accept": accept_header()})
+    events = events_frame_from_response(response)
+    meta = {
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "year": year,
+        "events": len(events),
+        "overview": overview,
+        "reference": reference,
+        "bins_file": None,
+        "cell_degrees": None,
+    }
+    # a map this small is drawn event by event, which needs the full rows
+    if len(events) > point_threshold:
+        bins, cell_degrees = aggregate_events(events, bin_degrees_for_zoom(COUNTRY_ZOOM))
+        # a new name per build, so a process still mapping the previous file is not affected
+        bins_file = "map-{}-{}.npy".format(year, int(time.time()))
+        np.save(os.path.join(path, bins_file), bins[BIN_COLUMNS].to_numpy(dtype="float64"))
+        meta.update(bins_file=bins_file, cell_degrees=cell_degrees, bins=len(bins))
+
+    tmp_path = os.path.join(path, META_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, default=str)
+    os.replace(tmp_path, os.path.join(path, META_FILE))
+    remove_old_bins(path, keep=meta["bins_file"])
+    logger.info("Snapshot of {} events built in {:.1f}s".format(len(events), time.perf_counter() - started))
+    return meta
+
+
+def remove_old_bins(path, keep=None, min_age=3600):
+    # previous builds' cell files, once no reader can still be using them
+    for bins_path in glob.glob(os.path.join(path, "map-*.npy")):
+        if os.path.basename(bins_path) != keep and time.time() - os.path.getmtime(bins_path) > min_age:
+            os.remove(bins_path)
+
+
+def load_snapshot(path, max_age=None):
+    # the snapshot in path, or None when there is none, it is unreadable or older than max_age seconds
+    try:
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        age = (datetime.now() - datetime.fromisoformat(meta["built_at"])).total_seconds()
+        if max_age is not None and age > max_age:
+            logger.warning("Ignoring the snapshot in {}, it is {:.0f}s old".format(path, age))
+            return None
+        bins = None
+        if meta.get("bins_file"):
+            # memory-mapped: the page cache is shared by every replica reading the same file
+            bins = np.load(os.path.join(path, meta["bins_file"]), mmap_mode="r")
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("No usable snapshot in {}: {}".format(path, e))
+        return None
+    return Snapshot(meta, bins)
+
+
+def bins_frame(snapshot):
+    return pd.DataFrame(snapshot.bins, columns=BIN_COLUMNS, copy=False)
+
+
+def main():
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Precompute the default dashboard views for fast cold starts.")
+    parser.add_argument("--out", default=os.getenv("SNAPSHOT_DIR", "snapshot"))
+    parser.add_argument("--base-url", default=os.getenv("BASE_URL"))
+    parser.add_argument("--year", type=int, help="map year, the current year by default")
+    parser.add_argument("--every", type=int, help="rebuild every this many seconds instead of once")
+    args = parser.parse_args()
+
+    client = ApiClient(args.base_url, default_timeout=(3.05, 300))
+    while True:
+        try:
+            build_snapshot(client, args.out, year=args.year)
+        except Exception as e:
+            logger.error("Error building the snapshot: {}".format(e))
+            if not args.every:
+                raise
+        if not args.every:
+            return
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
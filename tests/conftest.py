@@ -0,0 +1,25 @@
+import os
+import sys
+import time
+
+import pytest
+
+# the app modules live next to main.py, as in the benchmarks
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Clock:
+    # stands in for time.monotonic and time.time; tests advance it with clock.now += seconds
+    def __init__(self, now=1000000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    monkeypatch.setattr(time, "time", clock)
+    return clock
@@ -0,0 +1,141 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from api_client import ApiClient, CircuitBreaker, CircuitOpenError, is_backend_failure
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_half_open_trial_success_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.now += 1
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # only one trial call at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert not breaker.is_open
+    breaker.before_call()
+
+
+def test_breaker_half_open_trial_failure_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.now += 30
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_breaker_lost_trial_lets_another_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    breaker.before_call()
+    clock.now += 30
+    # the first trial never reported back
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_circuit_open_error_is_a_request_exception():
+    # callers that catch RequestException also handle a fast-failing call
+    assert issubclass(CircuitOpenError, requests.exceptions.RequestException)
+
+
+def test_is_backend_failure():
+    response = requests.Response()
+    response.status_code = 503
+    assert is_backend_failure(requests.exceptions.HTTPError(response=response))
+    response.status_code = 404
+    assert not is_backend_failure(requests.exceptions.HTTPError(response=response))
+    assert is_backend_failure(requests.exceptions.ConnectionError())
+
+
+def test_fan_out_yields_results_and_errors():
+    client = ApiClient("http://localhost/", max_workers=4)
+
+    def fail():
+        raise ValueError("boom")
+
+    results = {key: (result, error) for key, result, error in client.fan_out({"a": lambda: 1, "b": fail})}
+    client.close()
+    assert results["a"] == (1, None)
+    assert isinstance(results["b"][1], ValueError)
+
+
+def test_fan_out_window_bounds_calls_in_flight():
+    client = ApiClient("http://localhost/", max_workers=8)
+    lock = threading.Lock()
+    in_flight = [0, 0]
+
+    def call():
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+        return True
+
+    results = list(client.fan_out({i: call for i in range(40)}, window=3))
+    client.close()
+    assert len(results) == 40
+    assert in_flight[1] <= 3
+
+
+def test_fan_out_close_cancels_queued_calls():
+    client = ApiClient("http://localhost/", max_workers=2)
+    started = []
+    release = threading.Event()
+
+    def call(i):
+        started.append(i)
+        release.wait(1)
+        return i
+
+    calls = {i: (lambda i=i: call(i)) for i in range(20)}
+    results = client.fan_out(calls)
+    release.set()
+    next(results)
+    results.close()
+    time.sleep(0.1)
+    client.close()
+    # the window, plus at most one call submitted before the generator was closed
+    assert len(started) <= 4
@@ -0,0 +1,90 @@
+import pytest
+import requests
+
+from cache import BoundedCache, ReferenceCache
+
+
+def failing_loader():
+    raise requests.exceptions.ConnectionError("backend down")
+
+
+def test_lru_eviction_by_entries():
+    bounded = BoundedCache("test", max_entries=2)
+    bounded.set("a", 1)
+    bounded.set("b", 2)
+    bounded.get("a")
+    bounded.set("c", 3)
+    assert bounded.get("b") is None
+    assert bounded.get("a") == 1
+    assert bounded.stats()["evictions"] == 1
+
+
+def test_eviction_by_bytes():
+    bounded = BoundedCache("test", max_bytes=10)
+    bounded.set("a", "x", size=6)
+    bounded.set("b", "y", size=6)
+    assert bounded.get("a") is None
+    # a single value over the limit is not cached and evicts nothing
+    bounded.set("c", "z", size=11)
+    assert bounded.get("c") is None
+    assert bounded.get("b") == "y"
+
+
+def test_expired_entry_is_a_miss(clock):
+    bounded = BoundedCache("test")
+    bounded.set("a", 1, ttl=10)
+    clock.now += 10
+    assert bounded.get("a") is None
+    stats = bounded.stats()
+    assert stats["expirations"] == 1
+    assert stats["entries"] == 1
+
+
+def test_get_or_load_reloads_expired_entry(clock):
+    bounded = BoundedCache("test")
+    assert bounded.get_or_load("a", lambda: 1, ttl=10) == 1
+    assert bounded.get_or_load("a", lambda: 2, ttl=10) == 1
+    clock.now += 10
+    assert bounded.get_or_load("a", lambda: 3, ttl=10) == 3
+
+
+def test_serves_stale_entry_when_load_fails(clock):
+    bounded = BoundedCache("test", serve_stale_on=requests.exceptions.RequestException)
+    bounded.set("a", 1, ttl=10)
+    clock.now += 60
+    assert bounded.get_or_load("a", failing_loader, ttl=10) == 1
+    assert bounded.refresh("a", failing_loader) == 1
+    assert bounded.stats()["stale_hits"] == 2
+
+
+def test_failure_without_stored_value_raises():
+    bounded = BoundedCache("test", serve_stale_on=requests.exceptions.RequestException)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        bounded.get_or_load("a", failing_loader)
+
+
+def test_only_listed_exceptions_serve_stale():
+    bounded = BoundedCache("test", serve_stale_on=requests.exceptions.RequestException)
+    bounded.set("a", 1)
+
+    def broken():
+        raise KeyError("data")
+
+    with pytest.raises(KeyError):
+        bounded.refresh("a", broken)
+    # without serve_stale_on every failure is raised
+    plain = BoundedCache("test")
+    plain.set("a", 1)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        plain.refresh("a", failing_loader)
+
+
+def test_reference_cache_seed_serves_values_without_loading(monkeypatch):
+    calls = []
+    reference = ReferenceCache({"states": lambda: calls.append("states") or ["Lagos"]}, ttl=3600)
+    monkeypatch.setattr(reference, "_refresh_in_background", lambda name: calls.append("refresh " + name))
+    reference.seed({"states": ["Kano"], "unknown": ["x"]})
+    assert reference.get("states") == ["Kano"]
+    # seeded values are stale, so they are refreshed in the background and never loaded inline
+    assert "states" not in calls
+    assert "refresh states" in calls
@@ -0,0 +1,108 @@
+from datetime import date, timedelta
+
+import pytest
+
+from event_store import EventStore
+
+pytest.importorskip("pyarrow")
+
+TODAY = date.today()
+
+
+def event(event_id, days_ago, state="Lagos", fatalities=0):
+    day = TODAY - timedelta(days=days_ago)
+    return {
+        "event_id_cnty": event_id,
+        "event_date": day.isoformat(),
+        "year": day.year,
+        "event_type": "Riots",
+        "actor1": "Rioters (Nigeria)",
+        "admin1": state,
+        "admin2": state + " LGA",
+        "location": state + " town",
+        "latitude": 6.5,
+        "longitude": 3.4,
+        "fatalities": fatalities,
+    }
+
+
+class FakeResponse:
+    headers = {"Content-Type": "application/json"}
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return {"data": self.data}
+
+
+class FakeClient:
+    # answers /crime_events from a list of events, filtered like the backend
+    def __init__(self, events):
+        self.events = list(events)
+        self.calls = []
+
+    def get(self, endpoint, params=None, headers=None):
+        self.calls.append(dict(params))
+        events = [e for e in self.events if e["year"] == params["year"]]
+        if params.get("since"):
+            events = [e for e in events if e["event_date"] >= params["since"]]
+        return FakeResponse(events)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EventStore(str(tmp_path), first_year=TODAY.year - 2, lookback_days=90)
+
+
+def stored_ids(store):
+    return set(store.frame()["event_id_cnty"])
+
+
+def test_first_sync_downloads_everything(store):
+    client = FakeClient([event("A", 1), event("B", 10), event("C", 400)])
+    assert not store.ready
+    store.sync(client)
+    assert store.ready
+    assert stored_ids(store) == {"A", "B", "C"}
+    assert store.sync_state()["watermark"] == (TODAY - timedelta(days=1)).isoformat()
+    assert all("since" not in params for params in client.calls)
+
+
+def test_incremental_sync_refetches_the_lookback_window(store):
+    client = FakeClient([event("A", 1)])
+    store.sync(client)
+    client.calls.clear()
+    store.sync(client)
+    since = (TODAY - timedelta(days=91)).isoformat()
+    assert client.calls and all(params["since"] == since for params in client.calls)
+    assert [params["year"] for params in client.calls] == list(range(int(since[:4]), TODAY.year + 1))
+
+
+def test_late_events_within_the_window_are_merged(store):
+    client = FakeClient([event("A", 1), event("B", 5)])
+    store.sync(client)
+    # added to the backend after the first sync, dated before the watermark
+    client.events += [event("LATE", 60), event("TOO_OLD", 120)]
+    assert store.sync(client) == 1
+    assert stored_ids(store) == {"A", "B", "LATE"}
+
+
+def test_resent_events_replace_their_stored_copy(store):
+    client = FakeClient([event("A", 1), event("B", 5, fatalities=1)])
+    store.sync(client)
+    client.events = [event("A", 1), event("B", 5, fatalities=7)]
+    assert store.sync(client) == 0
+    frame = store.frame()
+    assert len(frame) == 2
+    assert frame.loc[frame["event_id_cnty"] == "B", "fatalities"].item() == 7
+
+
+def test_overview_reflects_merged_events(store):
+    client = FakeClient([event("A", 1, state="Lagos"), event("B", 5, state="Kano")])
+    store.sync(client)
+    client.events.append(event("LATE", 30, state="Kano"))
+    store.sync(client)
+    overview = store.overview()
+    assert overview["ranking"] == "Kano"
+    assert overview["historical"]["total_crimes"].sum() == 3
@@ -0,0 +1,122 @@
+import pytest
+import requests
+
+import report_queue
+from report_queue import PENDING, REJECTED, SENT, QueueFullError, ReportQueue, report_idempotency_key
+
+
+@pytest.fixture
+def queue(tmp_path, clock, monkeypatch):
+    # the longest delay, so the backoff is predictable
+    monkeypatch.setattr(report_queue.random, "uniform", lambda low, high: high)
+    return ReportQueue(str(tmp_path / "reports.sqlite3"), batch_size=10, max_pending=5, max_backoff=60, lease=120)
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError("{} error".format(status), response=response)
+
+
+def failing(error):
+    def send(reports):
+        raise error
+    return send
+
+
+def row(queue, key):
+    with queue._transaction() as connection:
+        return connection.execute("SELECT * FROM reports WHERE idempotency_key = ?", (key,)).fetchone()
+
+
+def test_enqueue_same_key_is_stored_once(queue):
+    queue.enqueue({"report": "a"}, idempotency_key="k")
+    queue.enqueue({"report": "a"}, idempotency_key="k")
+    assert queue.stats()[PENDING] == 1
+
+
+def test_report_key_depends_on_contents_and_salt():
+    report = {"state": "Lagos", "report": "robbery"}
+    assert report_idempotency_key(report, "s") == report_idempotency_key(dict(report), "s")
+    assert report_idempotency_key(report, "s") != report_idempotency_key(report, "t")
+    assert report_idempotency_key(report, "s") != report_idempotency_key(dict(report, report="theft"), "s")
+
+
+def test_enqueue_refuses_when_full(queue):
+    for i in range(5):
+        queue.enqueue({"report": i})
+    with pytest.raises(QueueFullError):
+        queue.enqueue({"report": "one too many"})
+
+
+def test_send_due_marks_sent_with_keys(queue):
+    key = queue.enqueue({"report": "a"})
+    sent = []
+    assert queue.send_due(lambda reports: sent.extend(reports)) == 1
+    assert sent == [{"report": "a", "idempotency_key": key}]
+    assert queue.status(key) == SENT
+    assert queue.send_due(lambda reports: None) == 0
+
+
+def test_only_accepted_keys_are_sent(queue):
+    first = queue.enqueue({"report": "a"})
+    second = queue.enqueue({"report": "b"})
+    assert queue.send_due(lambda reports: [first]) == 1
+    assert queue.status(first) == SENT
+    assert queue.status(second) == PENDING
+    assert row(queue, second)["attempts"] == 1
+
+
+def test_claimed_reports_are_leased(queue, clock):
+    queue.enqueue({"report": "a"})
+    assert len(queue.claim()) == 1
+    # a second worker does not pick up the report while the first one is sending it
+    assert queue.claim() == []
+    clock.now += 120
+    assert len(queue.claim()) == 1
+
+
+def test_server_error_is_retried_with_backoff(queue, clock):
+    key = queue.enqueue({"report": "a"})
+    for attempt, delay in ((1, 2), (2, 4), (3, 8)):
+        assert queue.send_due(failing(http_error(503))) == 0
+        stored = row(queue, key)
+        assert stored["status"] == PENDING
+        assert stored["attempts"] == attempt
+        assert stored["next_attempt_at"] == clock.now + delay
+        assert queue.claim() == []
+        clock.now += delay
+
+
+def test_backoff_is_capped(queue, clock):
+    key = queue.enqueue({"report": "a"})
+    for _ in range(10):
+        queue.send_due(failing(requests.exceptions.ConnectionError("down")))
+        delay = row(queue, key)["next_attempt_at"] - clock.now
+        assert delay <= 60
+        clock.now += delay
+    # 2 ** 10 seconds without the cap
+    assert delay == 60
+
+
+def test_client_error_rejects_for_good(queue):
+    key = queue.enqueue({"report": "a"})
+    assert queue.send_due(failing(http_error(422))) == 0
+    assert queue.status(key) == REJECTED
+    assert "422" in row(queue, key)["last_error"]
+    assert queue.stats()[REJECTED] == 1
+
+
+def test_retryable_client_errors_are_retried(queue):
+    key = queue.enqueue({"report": "a"})
+    queue.send_due(failing(http_error(429)))
+    assert queue.status(key) == PENDING
+    assert row(queue, key)["attempts"] == 1
+
+
+def test_reports_survive_reopening(tmp_path, clock):
+    path = str(tmp_path / "reports.sqlite3")
+    key = ReportQueue(path).enqueue({"report": "a"})
+    reopened = ReportQueue(path)
+    assert reopened.status(key) == PENDING
+    assert reopened.stats()["oldest_pending_seconds"] == 0
@@ -0,0 +1,66 @@
+import pandas as pd
+
+# chart granularity -> pandas period of each point; weeks run Monday to Sunday,
+# and every period is labelled by its first day (see period_series)
+FREQUENCIES = {"Monthly": "MS", "Weekly": "W-MON"}
+INDEX = ["event_date", "admin1", "actor1", "event_type"]
+# row and column name for events without an actor or event type
+UNKNOWN = "Unknown"
+# largest actor x event type table shown, by total events
+PIVOT_ACTORS = 15
+
+
+def daily_counts(events):
+    # Events and fatalities per (day, state, actor, event type), indexed and
+    # sorted by date then state. This is far smaller than the events and holds
+    # everything the trend views need, so changing a filter only re-aggregates
+    # these counts instead of the events.
+    if events.empty:
+        index = pd.MultiIndex.from_arrays([pd.DatetimeIndex([])] + [[] for _ in INDEX[1:]], names=INDEX)
+        return pd.DataFrame({"events": pd.Series(dtype="int64"), "fatalities": pd.Series(dtype="int64")}, index=index)
+    events = events.dropna(subset=["event_date"])
+    days = events["event_date"].dt.normalize()
+    # events with an unknown state, actor or event type still count towards the totals
+    grouped = events.groupby([days, events["admin1"], events["actor1"], events["event_type"]],
+                             observed=True, sort=False, dropna=False)
+    counts = pd.DataFrame({"events": grouped.size(), "fatalities": grouped["fatalities"].sum().astype("int64")})
+    counts.index.names = INDEX
+    return counts.sort_index()
+
+
+def select(counts, state=None, actor=None, event_type=None):
+    # the counts matching the filters; None means all
+    mask = None
+    for level, value in (("admin1", state), ("actor1", actor), ("event_type", event_type)):
+        if value is None:
+            continue
+        matches = counts.index.get_level_values(level) == value
+        mask = matches if mask is None else mask & matches
+    return counts if mask is None else counts[mask]
+
+
+def period_series(counts, frequency, window=1):
+    # events and fatalities per period with their rolling averages over window periods;
+    # periods without events are zero rather than missing
+    if counts.empty:
+        return pd.DataFrame(columns=["events", "fatalities", "events_avg", "fatalities_avg"])
+    # closed and labelled on the left: [Monday, next Monday) is labelled by its Monday
+    periods = pd.Grouper(level="event_date", freq=FREQUENCIES[frequency], label="left", closed="left")
+    series = counts.groupby(periods)[["events", "fatalities"]].sum()
+    rolling = series.rolling(window, min_periods=1).mean()
+    series["events_avg"] = rolling["events"]
+    series["fatalities_avg"] = rolling["fatalities"]
+    series.index.name = "period"
+    return series
+
+
+def actor_event_pivot(counts, max_actors=PIVOT_ACTORS):
+    # events per actor (rows, most active first) and event type (columns)
+    if counts.empty:
+        return pd.DataFrame()
+    pivot = counts.groupby(level=["actor1", "event_type"], observed=True, dropna=False)["events"].sum().unstack(fill_value=0)
+    totals = pivot.sum(axis=1).sort_values(ascending=False)
+    pivot = pivot.loc[totals.index[:max_actors]]
+    pivot.index = pivot.index.astype(object).fillna(UNKNOWN).astype(str)
+    pivot.columns = pivot.columns.astype(object).fillna(UNKNOWN).astype(str)
+    return pivot